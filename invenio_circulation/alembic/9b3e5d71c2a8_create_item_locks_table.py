@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Create item locks table."""
+
+import sqlalchemy as sa
+import sqlalchemy_utils
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '9b3e5d71c2a8'
+down_revision = '4f0c8a2b7d15'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'circulation_item_locks',
+        sa.Column('item_pid_type', sa.String(length=255), nullable=False),
+        sa.Column('item_pid_value', sa.String(length=255), nullable=False),
+        sa.Column(
+            'loan_id', sqlalchemy_utils.types.uuid.UUIDType(), nullable=True
+        ),
+        sa.PrimaryKeyConstraint(
+            'item_pid_type',
+            'item_pid_value',
+            name=op.f('pk_circulation_item_locks'),
+        ),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_table('circulation_item_locks')
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Create document loans counts table."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e2d7b4a9f1c6'
+down_revision = 'c6a1f0e9d3b7'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'circulation_document_loans_counts',
+        sa.Column('document_pid', sa.String(length=255), nullable=False),
+        sa.Column('active_loans', sa.Integer(), nullable=False),
+        sa.Column('pending_requests', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint(
+            'document_pid',
+            name=op.f('pk_circulation_document_loans_counts'),
+        ),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_table('circulation_document_loans_counts')
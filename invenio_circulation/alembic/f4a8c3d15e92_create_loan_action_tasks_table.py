@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Create loan action tasks table."""
+
+import sqlalchemy as sa
+import sqlalchemy_utils
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f4a8c3d15e92'
+down_revision = 'e2d7b4a9f1c6'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'circulation_loan_action_tasks',
+        sa.Column('created', sa.DateTime(), nullable=False),
+        sa.Column('updated', sa.DateTime(), nullable=False),
+        sa.Column('id', sa.String(length=255), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=255), nullable=False),
+        sa.Column('loan_pid', sa.String(length=255), nullable=False),
+        sa.Column('action', sa.String(length=255), nullable=False),
+        sa.Column(
+            'params', sqlalchemy_utils.types.json.JSONType(), nullable=False
+        ),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column(
+            'error', sqlalchemy_utils.types.json.JSONType(), nullable=True
+        ),
+        sa.PrimaryKeyConstraint(
+            'id', name=op.f('pk_circulation_loan_action_tasks')
+        ),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_table('circulation_loan_action_tasks')
@@ -8,18 +8,71 @@
 
 """Circulation API."""
 
-from elasticsearch import VERSION as ES_VERSION
+from functools import lru_cache
+
+import arrow
+from elasticsearch_dsl import Q
 from flask import current_app
-from invenio_jsonschemas import current_jsonschemas
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_pidstore.resolver import Resolver
 from invenio_records.api import Record
+from invenio_records.models import RecordMetadata
+from sqlalchemy.exc import IntegrityError
 
-from .errors import MissingRequiredParameterError, MultipleLoansOnItemError
+from .cache import get_callback
+from .errors import ItemNotAvailableError, MissingRequiredParameterError, \
+    MultipleLoansOnItemError
+from .models import ActiveLoan, DocumentLoansCount
 from .pidstore.pids import CIRCULATION_LOAN_PID_TYPE
-from .search.api import search_by_pid
+from .proxies import current_circulation
+from .search.api import loans_exist, search_by_item_pids, search_by_pid, \
+    search_overdue_loans, search_request_queue
 from .utils import str2datetime
 
 
+@lru_cache(maxsize=None)
+def _get_loan_resolver(record_cls):
+    """Return the PID resolver for the given loan record class."""
+    return Resolver(
+        pid_type=CIRCULATION_LOAN_PID_TYPE,
+        object_type="rec",
+        getter=record_cls.get_record,
+    )
+
+
+class LoanDateField(object):
+    """Typed accessor of a loan date field.
+
+    The string value of the field is parsed on first access and the parsed
+    value is cached until the field changes. Assigned values are kept as
+    datetimes and serialized when the loan is committed.
+    """
+
+    def __init__(self, name):
+        """Constructor.
+
+        :param name: the name of the date field.
+        """
+        self.name = name
+
+    def __get__(self, loan, owner):
+        """Return the field value as a datetime, or None if not set."""
+        if loan is None:
+            return self
+        return loan._get_date(self.name)
+
+    def __set__(self, loan, value):
+        """Set the field value."""
+        if value is not None and not isinstance(value, str):
+            value = str2datetime(value)
+        loan[self.name] = value
+
+    def __delete__(self, loan):
+        """Remove the field."""
+        del loan[self.name]
+
+
 class Loan(Record):
     """Loan record class."""
 
@@ -31,15 +84,25 @@ class Loan(Record):
     ]
     DATETIME_FIELDS = ["transaction_date"]
 
+    start_date = LoanDateField("start_date")
+    end_date = LoanDateField("end_date")
+    request_expire_date = LoanDateField("request_expire_date")
+    request_start_date = LoanDateField("request_start_date")
+    transaction_date = LoanDateField("transaction_date")
+
     _schema = "loans/loan-v1.0.0.json"
 
     def __init__(self, data, model=None):
         """Constructor."""
-        self.item_ref_builder = current_app.config[
-            "CIRCULATION_ITEM_REF_BUILDER"]
+        self._parsed_dates = {}
         self["state"] = current_app.config["CIRCULATION_LOAN_INITIAL_STATE"]
         super().__init__(data, model)
 
+    @property
+    def item_ref_builder(self):
+        """Return the configured item reference builder."""
+        return current_app.config["CIRCULATION_ITEM_REF_BUILDER"]
+
     @classmethod
     def build_resolver_fields(cls, data):
         """Build all resolver fields."""
@@ -53,7 +116,7 @@ class Loan(Record):
     @classmethod
     def create(cls, data, id_=None, **kwargs):
         """Create Loan record."""
-        data["$schema"] = current_jsonschemas.path_to_url(cls._schema)
+        data["$schema"] = current_circulation.get_schema_url(cls._schema)
         cls.build_resolver_fields(data)
 
         # resolve document if `item_pid` provided
@@ -63,37 +126,139 @@ class Loan(Record):
 
         return super().create(data, id_=id_, **kwargs)
 
+    def _use_cached_validator(self):
+        """Return True if the loan is validated with the cached validator."""
+        return current_app.config["CIRCULATION_LOAN_CACHED_VALIDATOR"] \
+            and self.get("$schema") \
+            and not getattr(self, "format_checker", None) \
+            and not getattr(self, "validator", None)
+
+    def validate(self, **kwargs):
+        """Validate the loan, with the cached validator if enabled."""
+        if kwargs or not self._use_cached_validator():
+            return super().validate(**kwargs)
+        current_circulation.get_validator(self["$schema"]).validate(self)
+
+    def _validate(self, format_checker=None, validator=None, use_model=False):
+        """Validate the loan, with the cached validator if enabled.
+
+        Invenio-Records validates the records with this method when they are
+        created and committed, from version 1.4.0. The previous versions call
+        `validate` instead.
+        """
+        if format_checker or validator or not self._use_cached_validator():
+            return super()._validate(
+                format_checker=format_checker,
+                validator=validator,
+                use_model=use_model,
+            )
+        if use_model:
+            json = self.model.json
+        else:
+            json = self.model_cls.encode(dict(self))
+        current_circulation.get_validator(self["$schema"]).validate(json)
+        return json
+
     def update(self, *args, **kwargs):
         """Update Loan record."""
         super().update(*args, **kwargs)
         self.build_resolver_fields(self)
 
+    def commit(self, **kwargs):
+        """Serialize the changed date fields and commit the loan."""
+        self.date_fields2str()
+        return super().commit(**kwargs)
+
+    def _get_date(self, field):
+        """Return the value of the date field, parsed once."""
+        value = self.get(field)
+        if not isinstance(value, str):
+            return value
+        parsed = self._parsed_dates.get(field)
+        if parsed is None or parsed[0] != value:
+            parsed = (value, str2datetime(value))
+            self._parsed_dates[field] = parsed
+        return parsed[1]
+
     def date_fields2datetime(self):
-        """Convert string datetime fields to Python datetime."""
+        """Convert string datetime fields to Python datetime.
+
+        :return: a dict mapping each converted field to a tuple with its
+            original string value and its converted value.
+        """
+        converted = {}
         for field in self.DATE_FIELDS + self.DATETIME_FIELDS:
             if field in self:
-                self[field] = str2datetime(self[field])
+                value = self._get_date(field)
+                converted[field] = (self[field], value)
+                self[field] = value
+        return converted
 
-    def date_fields2str(self):
-        """Convert Python datetime fields to string."""
-        for field in self.DATE_FIELDS:
-            if field in self:
-                self[field] = self[field].date().isoformat()
-        for field in self.DATETIME_FIELDS:
-            if field in self:
-                self[field] = self[field].isoformat()
+    def date_fields2str(self, converted=None):
+        """Convert Python datetime fields to string.
+
+        :param converted: the dict returned by `date_fields2datetime`. The
+            fields whose converted value has not been replaced since are
+            restored to their original string instead of being serialized.
+        """
+        converted = converted or {}
+        for field in self.DATE_FIELDS + self.DATETIME_FIELDS:
+            value = self.get(field)
+            if value is None or isinstance(value, str):
+                continue
+            original, converted_value = converted.get(field, (None, None))
+            if value is converted_value:
+                self[field] = original
+            elif field in self.DATE_FIELDS:
+                self[field] = value.date().isoformat()
+            else:
+                self[field] = value.isoformat()
 
     @classmethod
     def get_record_by_pid(cls, pid, with_deleted=False):
         """Get ils record by pid value."""
-        resolver = Resolver(
-            pid_type=CIRCULATION_LOAN_PID_TYPE,
-            object_type="rec",
-            getter=cls.get_record,
-        )
-        _, record = resolver.resolve(str(pid))
+        _, record = _get_loan_resolver(cls).resolve(str(pid))
         return record
 
+    @classmethod
+    def get_records_by_pids(cls, pids, with_deleted=False):
+        """Get loans by pid values with a single query.
+
+        :param pids: the list of loan pid values.
+        :param with_deleted: if True, deleted loans are returned as well.
+        :return: a tuple with the list of loans, in the same order as the
+            given pids, and the list of pids for which no loan was found.
+        """
+        pids = [str(pid) for pid in pids]
+        if not pids:
+            return [], []
+
+        query = db.session \
+            .query(PersistentIdentifier.pid_value, RecordMetadata) \
+            .join(
+                RecordMetadata,
+                RecordMetadata.id == PersistentIdentifier.object_uuid
+            ) \
+            .filter(
+                PersistentIdentifier.pid_type == CIRCULATION_LOAN_PID_TYPE,
+                PersistentIdentifier.object_type == "rec",
+                PersistentIdentifier.status == PIDStatus.REGISTERED,
+                PersistentIdentifier.pid_value.in_(set(pids)),
+            )
+        if not with_deleted:
+            query = query.filter(RecordMetadata.json != None)  # noqa
+
+        models = dict(query.all())
+        records = []
+        missing_pids = []
+        for pid in pids:
+            if pid in models:
+                model = models[pid]
+                records.append(cls(model.json, model=model))
+            else:
+                missing_pids.append(pid)
+        return records, missing_pids
+
     def update_item_ref(self, item_pid):
         """Replace item reference.
 
@@ -108,11 +273,14 @@ class Loan(Record):
         self["item_pid"] = item_pid
 
 
-def is_item_available_for_checkout(item_pid):
+def is_item_available_for_checkout(item_pid, loan_id=None):
     """Return True if the given item is available for loan, False otherwise.
 
     :param item_pid: a dict containing `value` and `type` fields to
         uniquely identify the item.
+    :param loan_id: the UUID of the loan to check out, if any: the item is
+        available when it is already attached to this active loan, e.g. at
+        desk.
     """
     config = current_app.config
     cfg_item_can_circulate = config["CIRCULATION_POLICIES"]["checkout"].get(
@@ -121,15 +289,85 @@ def is_item_available_for_checkout(item_pid):
     if not cfg_item_can_circulate(item_pid):
         return False
 
+    if config["CIRCULATION_ACTIVE_LOANS_TABLE"]:
+        active_loan = ActiveLoan.get_by_item_pid(item_pid)
+        return active_loan is None or (
+            loan_id is not None and active_loan.loan_id == loan_id
+        )
+
     search = search_by_pid(
         item_pid=item_pid,
         filter_states=config.get("CIRCULATION_STATES_LOAN_ACTIVE"),
     )
-    search_result = search.execute()
-    if ES_VERSION[0] >= 7:
-        return search_result.hits.total.value == 0
+    if loan_id is not None:
+        search = search.exclude("ids", values=[str(loan_id)])
+    return not loans_exist(search)
+
+
+# number of items searched at once, far below the max result window of the
+# search index
+ITEMS_SEARCH_CHUNK_SIZE = 1000
+
+
+def is_items_available_for_checkout(item_pids):
+    """Return the availability for loan of each of the given items.
+
+    The items are checked against active loans with one search per chunk
+    of ``ITEMS_SEARCH_CHUNK_SIZE`` items.
+    When the `item_can_circulate_many` checkout policy is configured, it is
+    called once for all the items instead of calling `item_can_circulate`
+    for each item.
+
+    :param item_pids: an iterable of dicts containing `value` and `type`
+        fields to uniquely identify the items.
+    :return: a dict mapping each `(type, value)` item PID tuple to True if the
+        item is available for loan, False otherwise.
+    """
+    item_pids = list(item_pids)
+    config = current_app.config
+    checkout_policies = config["CIRCULATION_POLICIES"]["checkout"]
+    cfg_item_can_circulate_many = checkout_policies.get(
+        "item_can_circulate_many"
+    )
+    if cfg_item_can_circulate_many:
+        results = cfg_item_can_circulate_many(item_pids)
     else:
-        return search_result.hits.total == 0
+        cfg_item_can_circulate = checkout_policies.get("item_can_circulate")
+        results = (cfg_item_can_circulate(item_pid) for item_pid in item_pids)
+
+    availability = {}
+    can_circulate = []
+    for item_pid, result in zip(item_pids, results):
+        key = (item_pid["type"], item_pid["value"])
+        availability[key] = bool(result)
+        if availability[key]:
+            can_circulate.append(item_pid)
+
+    if not can_circulate:
+        return availability
+
+    if config["CIRCULATION_ACTIVE_LOANS_TABLE"]:
+        for key in ActiveLoan.get_by_item_pids(can_circulate):
+            availability[key] = False
+        return availability
+
+    for start in range(0, len(can_circulate), ITEMS_SEARCH_CHUNK_SIZE):
+        chunk = can_circulate[start:start + ITEMS_SEARCH_CHUNK_SIZE]
+        search = search_by_item_pids(
+            chunk,
+            filter_states=config.get("CIRCULATION_STATES_LOAN_ACTIVE"),
+        )[:0]
+        search.aggs.bucket(
+            "item_values", "terms", field="item_pid.value", size=len(chunk)
+        ).bucket("item_types", "terms", field="item_pid.type")
+        search_result = search.execute()
+
+        for value_bucket in search_result.aggregations.item_values.buckets:
+            for type_bucket in value_bucket.item_types.buckets:
+                key = (type_bucket.key, value_bucket.key)
+                if key in availability:
+                    availability[key] = False
+    return availability
 
 
 def can_be_requested(loan):
@@ -141,6 +379,119 @@ def can_be_requested(loan):
     return cfg_can_be_requested(loan)
 
 
+def _scan_batches(search, batch_size):
+    """Yield the hits of the given search in lists of `batch_size` hits."""
+    batch = []
+    for hit in search.params(size=batch_size).scan():
+        batch.append(hit)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _scan_loans(search, chunk_size=100):
+    """Yield the loans matching the given search.
+
+    Only the PIDs are retrieved from the search: the loans are then fetched
+    from the database in chunks of `chunk_size` PIDs.
+    """
+    for hits in _scan_batches(search.source(["pid"]), chunk_size):
+        loans, _ = Loan.get_records_by_pids([hit["pid"] for hit in hits])
+        for loan in loans:
+            yield loan
+
+
+def get_overdue_loans(
+    as_of=None, batch_size=500, fields=None, slice_id=None, max_slices=None
+):
+    """Yield the overdue loans in batches.
+
+    The loans are streamed with a scroll, so that the memory usage does not
+    depend on the number of overdue loans. To process them in parallel,
+    each worker scrolls its own slice of the loans.
+
+    :param as_of: the date on which the loans are overdue, as a date,
+        datetime or ISO-8601 string. Defaults to today.
+    :param batch_size: the number of loans in each batch.
+    :param fields: if given, the list of fields retrieved from the search
+        index, and batches of dicts with these fields are yielded instead of
+        loans fetched from the database.
+    :param slice_id: the slice to scroll, between 0 and `max_slices` - 1.
+    :param max_slices: the number of slices the loans are divided in.
+    :return: a generator of lists of loans.
+    """
+    search = search_overdue_loans(as_of or arrow.utcnow())
+    if max_slices and max_slices > 1:
+        search = search.extra(slice=dict(id=slice_id or 0, max=max_slices))
+
+    if fields:
+        for hits in _scan_batches(search.source(fields), batch_size):
+            yield [hit.to_dict() for hit in hits]
+        return
+
+    for hits in _scan_batches(search.source(["pid"]), batch_size):
+        loans, _ = Loan.get_records_by_pids([hit["pid"] for hit in hits])
+        yield loans
+
+
+def get_request_queue(document_pid):
+    """Yield the pending loans of the document, oldest request first.
+
+    :param document_pid: the PID of the document.
+    """
+    search = search_request_queue(document_pid).params(preserve_order=True)
+    return _scan_loans(search)
+
+
+def get_request_queue_position(document_pid, patron_pid):
+    """Return the position of the patron in the request queue of a document.
+
+    Only the loans requested before the patron's one are counted, without
+    retrieving the queue.
+
+    :param document_pid: the PID of the document.
+    :param patron_pid: the PID of the patron.
+    :return: the position, starting from 1, of the oldest pending request of
+        the patron, or None if the patron has no pending request.
+    """
+    search = search_request_queue(document_pid)
+    hits = search.filter("term", patron_pid=patron_pid) \
+        .source(["pid", "transaction_date"])[:1].execute()
+    if not hits:
+        return None
+
+    # pending loans requested at the same time are ordered by PID
+    hit = hits[0]
+    requested_before = search.filter(
+        "bool",
+        should=[
+            Q("range", transaction_date=dict(lt=hit["transaction_date"])),
+            Q(
+                "bool",
+                filter=[
+                    Q("term", transaction_date=hit["transaction_date"]),
+                    Q("range", pid=dict(lt=hit["pid"])),
+                ],
+            ),
+        ],
+        minimum_should_match=1,
+    )
+    return requested_before.count() + 1
+
+
+def get_next_pending_loan(document_pid):
+    """Return the next pending loan to fulfil for a document, if any.
+
+    :param document_pid: the PID of the document.
+    """
+    hits = search_request_queue(document_pid).source(["pid"])[:1].execute()
+    if not hits:
+        return None
+    return Loan.get_record_by_pid(hits[0]["pid"])
+
+
 def get_pending_loans_by_item_pid(item_pid):
     """Return any pending loans for the given item.
 
@@ -151,8 +502,7 @@ def get_pending_loans_by_item_pid(item_pid):
         item_pid=item_pid,
         filter_states=current_app.config["CIRCULATION_STATES_LOAN_REQUEST"]
     )
-    for result in search.scan():
-        yield Loan.get_record_by_pid(result["pid"])
+    return _scan_loans(search)
 
 
 def get_pending_loans_by_doc_pid(document_pid):
@@ -163,14 +513,18 @@ def get_pending_loans_by_doc_pid(document_pid):
             "CIRCULATION_STATES_LOAN_REQUEST"
         ),
     )
-    for result in search.scan():
-        yield Loan.get_record_by_pid(result["pid"])
+    return _scan_loans(search)
 
 
 def get_available_item_by_doc_pid(document_pid):
     """Return an item pid available for this document."""
-    for item_pid in get_items_by_doc_pid(document_pid):
-        if is_item_available_for_checkout(item_pid):
+    item_pids = list(get_items_by_doc_pid(document_pid))
+    if not item_pids:
+        return None
+
+    availability = is_items_available_for_checkout(item_pids)
+    for item_pid in item_pids:
+        if availability[(item_pid["type"], item_pid["value"])]:
             return item_pid
     return None
 
@@ -184,7 +538,7 @@ def get_items_by_doc_pid(document_pid):
 
 def get_document_pid_by_item_pid(item_pid):
     """Return the document pid of this item_pid."""
-    return current_app.config["CIRCULATION_DOCUMENT_RETRIEVER_FROM_ITEM"](
+    return get_callback("CIRCULATION_DOCUMENT_RETRIEVER_FROM_ITEM")(
         item_pid
     )
 
@@ -198,14 +552,299 @@ def get_loan_for_item(item_pid):
     if not item_pid:
         return
 
+    if current_app.config["CIRCULATION_ACTIVE_LOANS_TABLE"]:
+        active_loan = ActiveLoan.get_by_item_pid(item_pid)
+        return Loan.get_record(active_loan.loan_id) if active_loan else None
+
     search = search_by_pid(
         item_pid=item_pid,
         filter_states=current_app.config["CIRCULATION_STATES_LOAN_ACTIVE"],
     )
+    # two hits are enough to detect multiple active loans
+    search = search.source(["pid"])[:2]
     loan = None
-    hits = list(search.scan())
+    hits = list(search.execute())
     if hits:
         if len(hits) > 1:
             raise MultipleLoansOnItemError(item_pid=item_pid)
         loan = Loan.get_record_by_pid(hits[0]["pid"])
     return loan
+
+
+def _search_loans_for_items(item_pids):
+    """Search the active loans of the given items.
+
+    :return: a tuple `(loan_pids, multiple)`, where `loan_pids` maps the
+        `(type, value)` tuple of each item with one active loan to the PID of
+        the loan, and `multiple` is the set of the tuples of the items with
+        multiple active loans.
+    """
+    loan_pids = {}
+    multiple = set()
+    pending = item_pids
+    while pending:
+        search = search_by_item_pids(
+            pending,
+            filter_states=current_app.config["CIRCULATION_STATES_LOAN_ACTIVE"],
+        )
+        # with one more hit than items, any item with multiple active loans
+        # is detected
+        search = search.source(["pid", "item_pid"])[:len(pending) + 1]
+        hits = list(search.execute())
+        found = {}
+        for hit in hits:
+            key = (hit["item_pid"]["type"], hit["item_pid"]["value"])
+            if key in found:
+                multiple.add(key)
+            found[key] = hit["pid"]
+        if len(hits) <= len(pending):
+            loan_pids.update(found)
+            break
+        # the hits of the other items may have been left out: search them
+        # again without the items with multiple active loans
+        pending = [
+            item_pid for item_pid in pending
+            if (item_pid["type"], item_pid["value"]) not in multiple
+        ]
+    for key in multiple:
+        loan_pids.pop(key, None)
+    return loan_pids, multiple
+
+
+def get_loans_for_items(item_pids, errors=None):
+    """Return the Loan attached to each of the given items, if any.
+
+    :param item_pids: a list of dicts containing `value` and `type` fields to
+        uniquely identify the items.
+    :param errors: if given, a dict in which the `MultipleLoansOnItemError`
+        of each item with multiple active loans is stored, with the
+        `(type, value)` item PID tuple as key, instead of being raised. These
+        items are mapped to None.
+    :return: a dict mapping each `(type, value)` item PID tuple to its active
+        Loan, or None.
+    """
+    loans = {
+        (item_pid["type"], item_pid["value"]): None for item_pid in item_pids
+    }
+    if not loans:
+        return loans
+
+    loan_cls = current_circulation.loan_record_cls
+    if current_app.config["CIRCULATION_ACTIVE_LOANS_TABLE"]:
+        active_loans = ActiveLoan.get_by_item_pids(item_pids)
+        records = loan_cls.get_records([
+            active_loan.loan_id for active_loan in active_loans.values()
+        ])
+        records_by_id = {record.id: record for record in records}
+        for key, active_loan in active_loans.items():
+            loans[key] = records_by_id.get(active_loan.loan_id)
+        return loans
+
+    keys = list(loans)
+    loan_pids = {}
+    for start in range(0, len(keys), ITEMS_SEARCH_CHUNK_SIZE):
+        chunk = [
+            dict(type=key[0], value=key[1])
+            for key in keys[start:start + ITEMS_SEARCH_CHUNK_SIZE]
+        ]
+        chunk_loan_pids, multiple = _search_loans_for_items(chunk)
+        for key in sorted(multiple):
+            error = MultipleLoansOnItemError(
+                item_pid=dict(type=key[0], value=key[1])
+            )
+            if errors is None:
+                raise error
+            errors[key] = error
+        loan_pids.update(chunk_loan_pids)
+
+    records, _ = loan_cls.get_records_by_pids(loan_pids.values())
+    records_by_pid = {record["pid"]: record for record in records}
+    for key, loan_pid in loan_pids.items():
+        loans[key] = records_by_pid.get(loan_pid)
+    return loans
+
+
+def update_active_loan(initial_loan, loan):
+    """Update the active loan of the items of a loan that changed.
+
+    :param initial_loan: the loan before the change.
+    :param loan: the changed loan, not committed yet.
+    """
+    active_states = current_app.config["CIRCULATION_STATES_LOAN_ACTIVE"]
+    initial_item_pid = initial_loan.get("item_pid") \
+        if initial_loan.get("state") in active_states else None
+    item_pid = loan.get("item_pid") \
+        if loan.get("state") in active_states else None
+
+    if initial_item_pid and initial_item_pid != item_pid:
+        ActiveLoan.query.filter_by(
+            item_pid_type=initial_item_pid["type"],
+            item_pid_value=initial_item_pid["value"],
+            loan_id=loan.id,
+        ).delete()
+
+    if item_pid:
+        active_loan = ActiveLoan.get_by_item_pid(item_pid)
+        if active_loan is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ActiveLoan(
+                        item_pid_type=item_pid["type"],
+                        item_pid_value=item_pid["value"],
+                        loan_id=loan.id,
+                    ))
+            except IntegrityError:
+                # checked out by a concurrent transaction in the meantime
+                raise ItemNotAvailableError(
+                    item_pid=item_pid, transition=loan["state"]
+                )
+        elif active_loan.loan_id != loan.id:
+            raise ItemNotAvailableError(
+                item_pid=item_pid, transition=loan["state"]
+            )
+
+
+def rebuild_active_loans(batch_size=500):
+    """Fill the active loans table with the active loans of the index.
+
+    The table is emptied first, then the active loans are scanned from the
+    search index, which must be up to date. The changes are not committed.
+
+    :param batch_size: the number of loans retrieved at once.
+    :return: a tuple `(count, conflicts)`, where `count` is the number of
+        active loans added and `conflicts` the list of the PIDs of the loans
+        skipped because their item has already another active loan.
+    """
+    search = current_circulation.loan_search_cls() \
+        .filter(
+            "terms",
+            state=current_app.config["CIRCULATION_STATES_LOAN_ACTIVE"],
+        ) \
+        .filter("exists", field="item_pid") \
+        .source(["pid", "item_pid"])
+
+    ActiveLoan.query.delete()
+    item_keys = set()
+    conflicts = []
+    for hits in _scan_batches(search, batch_size):
+        active_loans = []
+        for hit in hits:
+            key = (hit.item_pid.type, hit.item_pid.value)
+            if key in item_keys:
+                conflicts.append(hit.pid)
+                continue
+            item_keys.add(key)
+            active_loans.append(dict(
+                item_pid_type=key[0], item_pid_value=key[1],
+                loan_id=hit.meta.id,
+            ))
+        if active_loans:
+            db.session.execute(ActiveLoan.__table__.insert(), active_loans)
+    return len(item_keys), conflicts
+
+
+def _document_loans_counts(loan):
+    """Return the document of the loan and what it adds to its counts."""
+    config = current_app.config
+    document_pid = loan.get("document_pid")
+    state = loan.get("state")
+    return document_pid, (
+        int(state in config["CIRCULATION_STATES_LOAN_ACTIVE"]),
+        int(state in config["CIRCULATION_STATES_LOAN_REQUEST"]),
+    )
+
+
+def update_document_loans_counts(initial_loan, loan):
+    """Update the counts of the document of a loan that changed.
+
+    :param initial_loan: the loan before the change.
+    :param loan: the changed loan, not committed yet.
+    """
+    deltas = {}
+    for _loan, sign in ((initial_loan, -1), (loan, 1)):
+        document_pid, counts = _document_loans_counts(_loan)
+        if document_pid:
+            active_loans, pending_requests = deltas.get(document_pid, (0, 0))
+            deltas[document_pid] = (
+                active_loans + sign * counts[0],
+                pending_requests + sign * counts[1],
+            )
+
+    for document_pid, (active_loans, pending_requests) in deltas.items():
+        if active_loans or pending_requests:
+            DocumentLoansCount.increment(
+                document_pid,
+                active_loans=active_loans,
+                pending_requests=pending_requests,
+            )
+
+
+def get_documents_loans_counts(document_pids):
+    """Return the number of active loans and pending requests of documents.
+
+    The counts are read with one query from the table maintained when
+    ``CIRCULATION_DOCUMENT_LOANS_COUNTS`` is enabled.
+
+    :param document_pids: a list of document PIDs.
+    :return: a dict mapping each document PID to a dict with the
+        `active_loans` and `pending_requests` counts, or None when
+        ``CIRCULATION_DOCUMENT_LOANS_COUNTS`` is disabled, the counts not
+        being maintained.
+    """
+    if not current_app.config["CIRCULATION_DOCUMENT_LOANS_COUNTS"]:
+        return None
+
+    counts = DocumentLoansCount.get_by_document_pids(document_pids)
+    results = {}
+    for document_pid in document_pids:
+        document_counts = counts.get(document_pid)
+        results[document_pid] = dict(
+            active_loans=document_counts.active_loans
+            if document_counts else 0,
+            pending_requests=document_counts.pending_requests
+            if document_counts else 0,
+        )
+    return results
+
+
+def rebuild_document_loans_counts(batch_size=500):
+    """Count the active loans and pending requests of the index.
+
+    The table is emptied first, then the loans are scanned from the search
+    index, which must be up to date. The changes are not committed.
+
+    :param batch_size: the number of loans retrieved at once.
+    :return: the number of documents with active loans or pending requests.
+    """
+    config = current_app.config
+    search = current_circulation.loan_search_cls() \
+        .filter(
+            "terms",
+            state=config["CIRCULATION_STATES_LOAN_ACTIVE"]
+            + config["CIRCULATION_STATES_LOAN_REQUEST"],
+        ) \
+        .filter("exists", field="document_pid") \
+        .source(["document_pid", "state"])
+
+    counts = {}
+    for hits in _scan_batches(search, batch_size):
+        for hit in hits:
+            document_pid, loan_counts = _document_loans_counts(hit.to_dict())
+            active_loans, pending_requests = counts.get(document_pid, (0, 0))
+            counts[document_pid] = (
+                active_loans + loan_counts[0],
+                pending_requests + loan_counts[1],
+            )
+
+    DocumentLoansCount.query.delete()
+    if counts:
+        db.session.execute(DocumentLoansCount.__table__.insert(), [
+            dict(
+                document_pid=document_pid,
+                active_loans=active_loans,
+                pending_requests=pending_requests,
+            )
+            for document_pid, (active_loans, pending_requests)
+            in counts.items()
+        ])
+    return len(counts)
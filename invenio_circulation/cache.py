@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Circulation caching of the configured callbacks."""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from flask import current_app, g
+
+from .proxies import current_circulation
+
+_REQUEST_CACHE = "circulation_callbacks_cache"
+
+
+class TTLCache(object):
+    """Thread-safe LRU cache with a bounded size and expiring entries."""
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        """Constructor.
+
+        :param maxsize: the maximum number of entries.
+        :param ttl: the time to live of an entry, in seconds.
+        :param timer: function returning the current time, in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of entries."""
+        return len(self._data)
+
+    def get_or_set(self, key, func):
+        """Return the value of the key, calling func to set it if missing."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > self.timer():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = func()
+        with self._lock:
+            self._data[key] = (self.timer() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, predicate=None):
+        """Remove the entries whose key matches the predicate, or all."""
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+
+def _freeze(value):
+    """Return a hashable version of the given callback argument."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _request_cached_call(name, func, *args):
+    """Call the callback, memoizing its result in the application context."""
+    cache = g.setdefault(_REQUEST_CACHE, {})
+    key = (name, _freeze(args))
+    if key not in cache:
+        cache[key] = func(*args)
+    return cache[key]
+
+
+def _process_cached_call(name, func, *args):
+    """Call the callback, memoizing its result in the process cache."""
+    return current_circulation.callbacks_cache.get_or_set(
+        (name, _freeze(args)), partial(func, *args)
+    )
+
+
+def get_callback(name):
+    """Return the callback configured in the given config variable.
+
+    The callback is memoized in the process when listed in
+    `CIRCULATION_PROCESS_CACHED_CALLBACKS`, and for the duration of the
+    application context (e.g. the request) when listed in
+    `CIRCULATION_REQUEST_CACHED_CALLBACKS`.
+    """
+    func = current_app.config[name]
+    if name in current_app.config["CIRCULATION_PROCESS_CACHED_CALLBACKS"]:
+        func = partial(_process_cached_call, name, func)
+    if name in current_app.config["CIRCULATION_REQUEST_CACHED_CALLBACKS"]:
+        func = partial(_request_cached_call, name, func)
+    return func
+
+
+def invalidate_request_cache(item_pids=None):
+    """Invalidate the callbacks results memoized in the application context.
+
+    :param item_pids: a list of dicts containing `value` and `type` fields to
+        uniquely identify the items. If given, only the results of the calls
+        for these items are invalidated, otherwise all of them.
+    """
+    cache = g.get(_REQUEST_CACHE)
+    if not cache:
+        return
+    if item_pids is None:
+        cache.clear()
+        return
+    frozen_item_pids = {_freeze(item_pid) for item_pid in item_pids}
+    for key in list(cache):
+        if frozen_item_pids.intersection(key[1]):
+            del cache[key]
+
+
+def invalidate_process_cache(item_pids=None):
+    """Invalidate the callbacks results memoized in the process.
+
+    :param item_pids: a list of dicts containing `value` and `type` fields to
+        uniquely identify the items. If given, only the results of the calls
+        for these items are invalidated, otherwise all of them.
+    """
+    cache = current_circulation.callbacks_cache
+    if item_pids is None:
+        cache.invalidate()
+        return
+    frozen_item_pids = {_freeze(item_pid) for item_pid in item_pids}
+    cache.invalidate(lambda key: frozen_item_pids.intersection(key[1]))
+
+
+def on_item_changed(sender, item_pid=None, **kwargs):
+    """Invalidate the memoized callbacks results of the changed item."""
+    item_pids = [item_pid] if item_pid else None
+    invalidate_process_cache(item_pids=item_pids)
+    invalidate_request_cache(item_pids=item_pids)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Circulation command line interface."""
+
+import json
+
+import click
+from flask.cli import with_appcontext
+from invenio_db import db
+
+from .api import get_overdue_loans, rebuild_active_loans, \
+    rebuild_document_loans_counts
+from .errors import InvalidLoanImportError
+from .importer import import_loans
+
+
+@click.group()
+def circulation():
+    """Circulation commands."""
+
+
+@circulation.command("import-loans")
+@click.argument("source", type=click.File("r"))
+@click.option("--chunk-size", default=500, show_default=True,
+              help="Number of loans inserted and committed at once.")
+@click.option("--no-index", is_flag=True, default=False,
+              help="Do not index the imported loans.")
+@with_appcontext
+def import_loans_command(source, chunk_size, no_index):
+    """Import loans from a file of JSON lines, one loan per line."""
+    loans_data = (json.loads(line) for line in source if line.strip())
+    try:
+        count = import_loans(
+            loans_data, chunk_size=chunk_size, index=not no_index
+        )
+    except InvalidLoanImportError as error:
+        raise click.BadParameter(error.description, param_hint="SOURCE")
+    click.secho("{} loans imported.".format(count), fg="green")
+
+
+@circulation.command("overdue-loans")
+@click.option("--as-of", default=None,
+              help="Date on which the loans are overdue. Defaults to today.")
+@click.option("--field", "fields", multiple=True,
+              default=["pid", "patron_pid", "item_pid", "document_pid",
+                       "end_date"],
+              show_default=True, help="Field of the loans to output.")
+@click.option("--batch-size", default=500, show_default=True,
+              help="Number of loans retrieved at once.")
+@click.option("--slice-id", default=0, show_default=True,
+              help="Slice of the loans to output, starting from 0.")
+@click.option("--max-slices", default=1, show_default=True,
+              help="Number of slices, to run parallel workers.")
+@with_appcontext
+def overdue_loans_command(as_of, fields, batch_size, slice_id, max_slices):
+    """Output the overdue loans as JSON lines, one loan per line."""
+    batches = get_overdue_loans(
+        as_of=as_of,
+        batch_size=batch_size,
+        fields=list(fields),
+        slice_id=slice_id,
+        max_slices=max_slices,
+    )
+    for batch in batches:
+        click.echo("\n".join(json.dumps(loan) for loan in batch))
+
+
+@circulation.command("rebuild-active-loans")
+@click.option("--batch-size", default=500, show_default=True,
+              help="Number of loans retrieved at once.")
+@with_appcontext
+def rebuild_active_loans_command(batch_size):
+    """Fill the active loans table with the active loans of the index."""
+    count, conflicts = rebuild_active_loans(batch_size=batch_size)
+    db.session.commit()
+    for pid in conflicts:
+        click.secho(
+            "Loan {} skipped: its item has another active loan.".format(pid),
+            fg="yellow",
+        )
+    click.secho("{} active loans added.".format(count), fg="green")
+
+
+@circulation.command("rebuild-document-loans-counts")
+@click.option("--batch-size", default=500, show_default=True,
+              help="Number of loans retrieved at once.")
+@with_appcontext
+def rebuild_document_loans_counts_command(batch_size):
+    """Count the active loans and pending requests of the documents."""
+    count = rebuild_document_loans_counts(batch_size=batch_size)
+    db.session.commit()
+    click.secho("{} documents counted.".format(count), fg="green")
@@ -108,6 +108,73 @@ CIRCULATION_LOAN_TRANSITIONS = {
 CIRCULATION_LOAN_INITIAL_STATE = "CREATED"
 """Define the initial state name of a Loan."""
 
+CIRCULATION_CHECKOUT_LOCKING = False
+"""Serialize the concurrent checkouts of the same item in the database.
+
+When enabled, a checkout locks the item in the ``circulation_item_locks``
+table until the end of its database transaction, and checks in the database
+that the last loan checked out on the item is not active anymore. Concurrent
+checkouts of the same item are then refused without relying on the search
+index being refreshed.
+"""
+
+CIRCULATION_ACTIVE_LOANS_TABLE = False
+"""Read the active loan of items from the database instead of the index.
+
+When enabled, the transitions maintain the active loan of each item in the
+``circulation_active_loans`` table, in the same database transaction as the
+loans. The availability of items and their active loan are then read from
+it with a primary key lookup, without depending on the search index being
+refreshed. Run ``circulation rebuild-active-loans`` to fill the table with
+the existing loans when enabling it.
+"""
+
+CIRCULATION_DOCUMENT_LOANS_COUNTS = False
+"""Maintain the number of active loans and pending requests of documents.
+
+When enabled, the transitions update the counts of the document of the loan
+in the ``circulation_document_loans_counts`` table, in the same database
+transaction as the loan. ``get_documents_loans_counts`` then returns the
+counts of many documents with one query, and None when disabled. Run
+``circulation rebuild-document-loans-counts`` to count the existing loans
+when enabling it.
+"""
+
+CIRCULATION_LOAN_CACHED_VALIDATOR = False
+"""Validate loans with a JSON schema validator built once per schema.
+
+When enabled, the loan JSON schema is checked and its references resolved
+once, and the validator is reused by `Loan.create` and `Loan.commit`,
+instead of building it at each validation. Custom
+``RECORDS_VALIDATION_TYPES`` are not supported by the cached validator.
+"""
+
+CIRCULATION_LOAN_INDEXING_MODE = "sync"
+"""Define how the loans modified by transitions are indexed.
+
+- ``sync``: each loan is indexed right after it has been modified.
+- ``bulk``: the modified loans are collected and indexed together with bulk
+  requests when the application context ends (e.g. at the end of the
+  request). The bulk indexing queue is not used.
+- ``queue``: the modified loans are collected and sent to the bulk indexing
+  queue with `RecordIndexer.bulk_index` when the application context ends,
+  to be processed asynchronously (e.g. by the `invenio-indexer` Celery
+  tasks).
+"""
+
+CIRCULATION_LOAN_ACTIONS_ASYNC = []
+"""List of the loan actions executed asynchronously by a Celery task.
+
+A request to one of these actions on a loan returns ``202 Accepted`` with the
+URL of the status of the task, instead of the transitioned loan. The client
+can send an ``Idempotency-Key`` header: the action is executed once for all
+the requests of the user with the same key, which cannot be reused for
+another loan, action or parameters. The permission of the transitions is
+checked when the action is requested, and the task executes the action with
+the identity of the user who requested it. The status of the task can only
+be read by this user, or with the permission to read the loan.
+"""
+
 CIRCULATION_PATRON_EXISTS = patron_exists
 """Function that returns True if the given Patron exists."""
 
@@ -120,6 +187,42 @@ CIRCULATION_DOCUMENT_EXISTS = document_exists
 CIRCULATION_ITEM_LOCATION_RETRIEVER = item_location_retriever
 """Function that returns the Location PID of the given Item."""
 
+CIRCULATION_ITEMS_LOCATION_RETRIEVER = None
+"""Function that returns the Location PIDs of the given list of Items.
+
+Optional: when defined, the locations of the items of a batch of transitions,
+e.g. a bulk checkin, are retrieved at once. It returns a list of Location PIDs
+in the same order of the given Item PIDs.
+"""
+
+CIRCULATION_REQUEST_CACHED_CALLBACKS = []
+"""List of config variables of the callbacks to memoize during a request.
+
+The results of the listed callbacks are memoized for the duration of the
+application context, i.e. the request, and invalidated for the items of the
+loans modified by a transition. Supported callbacks are
+``CIRCULATION_ITEM_EXISTS``, ``CIRCULATION_PATRON_EXISTS``,
+``CIRCULATION_ITEM_LOCATION_RETRIEVER`` and
+``CIRCULATION_DOCUMENT_RETRIEVER_FROM_ITEM``.
+"""
+
+CIRCULATION_PROCESS_CACHED_CALLBACKS = []
+"""List of config variables of the callbacks to memoize in the process.
+
+The results of the listed callbacks are kept in a LRU cache shared by all
+the requests served by the process, for callbacks whose results seldom
+change such as ``CIRCULATION_ITEM_LOCATION_RETRIEVER`` and
+``CIRCULATION_DOCUMENT_RETRIEVER_FROM_ITEM``. The cached results of an item
+are invalidated when the host application sends the
+``invenio_circulation.signals.item_changed`` signal.
+"""
+
+CIRCULATION_PROCESS_CACHE_MAXSIZE = 10000
+"""Maximum number of callbacks results kept in the process cache."""
+
+CIRCULATION_PROCESS_CACHE_TTL = 300
+"""Time to live, in seconds, of the callbacks results in the process cache."""
+
 CIRCULATION_TRANSACTION_LOCATION_VALIDATOR = transaction_location_validator
 """Function that validates the Location PID of the given transaction."""
 
@@ -167,7 +270,13 @@ CIRCULATION_POLICIES = dict(
     ),
     request=dict(can_be_requested=can_be_requested),
 )
-"""Default circulation policies when performing an action on a Loan."""
+"""Default circulation policies when performing an action on a Loan.
+
+The `checkout` policies accept an optional `item_can_circulate_many` function
+that, given a list of item PIDs, returns a list of booleans in the same order.
+When defined, it is preferred to `item_can_circulate` when checking the
+availability of many items at once, e.g. all the items of a document.
+"""
 
 CIRCULATION_REST_ENDPOINTS = dict(
     loanid=dict(
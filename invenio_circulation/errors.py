@@ -174,5 +174,34 @@ class NotImplementedConfigurationError(CirculationException):
         super().__init__(**kwargs)
 
 
+class InvalidLoanImportError(CirculationException):
+    """Exception raised when a loan to import is not valid."""
+
+    def __init__(self, index=None, reason=None, **kwargs):
+        """Initialize exception.
+
+        :param index: the position of the loan in the import, from 1.
+        :param reason: why the loan is not valid.
+        """
+        self.description = "Loan #{0} cannot be imported: {1}".format(
+            index, reason
+        )
+        super().__init__(**kwargs)
+
+
+class IdempotencyKeyReusedError(CirculationException):
+    """Exception raised when an idempotency key is used for another action."""
+
+    code = 422
+
+    def __init__(self, key=None, **kwargs):
+        """Initialize exception."""
+        self.description = (
+            "The idempotency key '{}' has already been used for another "
+            "action".format(key)
+        )
+        super().__init__(**kwargs)
+
+
 class MissingRequiredParameterError(CirculationException):
     """Exception raised when required parameter is missing."""
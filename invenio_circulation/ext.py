@@ -10,20 +10,29 @@
 
 from __future__ import absolute_import, print_function
 
+import threading
 from copy import deepcopy
 
 from flask import current_app
+from invenio_db import db
 from invenio_indexer.api import RecordIndexer
+from invenio_jsonschemas import current_jsonschemas
 from invenio_records_rest.utils import obj_or_import_string
+from jsonschema.validators import validator_for
 from werkzeug.utils import cached_property
 
 from . import config
 from .api import Loan
-from .errors import InvalidLoanStateError, NoValidTransitionAvailableError, \
+from .cache import TTLCache, on_item_changed
+from .errors import CirculationException, InvalidLoanStateError, \
+    InvalidPermissionError, NoValidTransitionAvailableError, \
     TransitionConditionsFailedError
+from .indexer import flush_loans_index
 from .pidstore.pids import CIRCULATION_LOAN_PID_TYPE
 from .search.api import LoansSearch
+from .signals import item_changed
 from .transitions.base import Transition
+from .transitions.batch import TransitionsBatch
 
 
 class InvenioCirculation(object):
@@ -31,6 +40,8 @@ class InvenioCirculation(object):
 
     def __init__(self, app=None):
         """Extension initialization."""
+        self._schema_urls = {}
+        self._validators = threading.local()
         if app:
             self.app = app
             self.init_app(app)
@@ -47,6 +58,8 @@ class InvenioCirculation(object):
         app.config["RECORDS_REST_ENDPOINTS"].update(
             app.config["CIRCULATION_REST_ENDPOINTS"]
         )
+        app.teardown_appcontext(flush_loans_index)
+        item_changed.connect(on_item_changed)
         app.extensions["invenio-circulation"] = self
 
     def init_config(self, app):
@@ -70,6 +83,39 @@ class InvenioCirculation(object):
             )
         )
 
+    @cached_property
+    def callbacks_cache(self):
+        """Return the process cache of the callbacks results."""
+        return TTLCache(
+            maxsize=current_app.config["CIRCULATION_PROCESS_CACHE_MAXSIZE"],
+            ttl=current_app.config["CIRCULATION_PROCESS_CACHE_TTL"],
+        )
+
+    def get_schema_url(self, path):
+        """Return the URL of the given JSON schema path, computed once."""
+        if path not in self._schema_urls:
+            self._schema_urls[path] = current_jsonschemas.path_to_url(path)
+        return self._schema_urls[path]
+
+    def get_validator(self, schema_url):
+        """Return the validator of the given JSON schema URL, built once.
+
+        The schema is checked and its references are resolved when the
+        validator is built, instead of at each validation. Validators are
+        built once per thread, their references resolver not being thread
+        safe.
+        """
+        validators = self._validators.__dict__
+        if schema_url not in validators:
+            schema = {"$ref": schema_url}
+            validator_cls = validator_for(schema)
+            records_state = current_app.extensions["invenio-records"]
+            validators[schema_url] = validator_cls(
+                schema,
+                resolver=records_state.ref_resolver_cls.from_schema(schema),
+            )
+        return validators[schema_url]
+
     def _get_endpoint_config(self):
         """Return endpoint configuration for circulation."""
         endpoints = self.app.config.get('CIRCULATION_REST_ENDPOINTS', [])
@@ -103,12 +149,26 @@ class _Circulation(object):
     def __init__(self, transitions_config):
         """Constructor."""
         self.transitions = {}
+        self.transitions_by_trigger = {}
         for src_state, transitions in transitions_config.items():
             self.transitions.setdefault(src_state, [])
             for t in transitions:
                 _cls = t.pop("transition", Transition)
                 instance = _cls(**dict(t, src=src_state))
                 self.transitions[src_state].append(instance)
+                self.transitions_by_trigger.setdefault(
+                    (src_state, instance.trigger), []
+                ).append(instance)
+
+    def reload_config(self):
+        """Bind again the configured policies and callbacks to transitions.
+
+        To be called when the configuration changes after the state machine
+        is built, e.g. in tests.
+        """
+        for transitions in self.transitions.values():
+            for t in transitions:
+                t.bind_config()
 
     def _validate_current_state(self, state):
         """Validate that the given loan state is configured."""
@@ -120,7 +180,10 @@ class _Circulation(object):
         current_state = loan.get("state")
         self._validate_current_state(current_state)
 
-        for t in self.transitions[current_state]:
+        candidates = self.transitions_by_trigger.get(
+            (current_state, kwargs.get("trigger", "next")), []
+        )
+        for t in candidates:
             try:
                 t.execute(loan, **kwargs)
                 return loan
@@ -130,3 +193,55 @@ class _Circulation(object):
         raise NoValidTransitionAvailableError(
             loan_pid=loan["pid"], state=current_state
         )
+
+    def check_permission(self, loan, trigger="next"):
+        """Check that the current user can trigger the action on the loan.
+
+        To be called before triggering the action later, e.g. in a task: the
+        action is permitted when the user has the permission of one of its
+        transitions from the current state of the loan.
+        """
+        current_state = loan.get("state")
+        self._validate_current_state(current_state)
+
+        candidates = self.transitions_by_trigger.get(
+            (current_state, trigger), []
+        )
+        if not candidates:
+            raise NoValidTransitionAvailableError(
+                loan_pid=loan["pid"], state=current_state
+            )
+        for t in candidates:
+            if not t.permission_factory or t.permission_factory(loan).can():
+                return
+        raise InvalidPermissionError(
+            permission=candidates[0].permission_factory(loan)
+        )
+
+    def trigger_many(self, loans_params, trigger="next"):
+        """Trigger the same action on many loans, committing them at once.
+
+        Each transition runs in its own savepoint, so that a failing loan
+        does not prevent the others from being committed. The availability
+        of the items is retrieved with a single search.
+
+        :param loans_params: a list of `(loan, params)` tuples, where `params`
+            are the parameters of the action for the loan.
+        :param trigger: the action to trigger on all the loans.
+        :return: a list of `(loan, error)` tuples, in the same order, where
+            `error` is the raised exception, or None on success.
+        """
+        item_pids = [
+            params.get("item_pid") or loan.get("item_pid")
+            for loan, params in loans_params
+        ]
+        results = []
+        with TransitionsBatch(item_pids=[pid for pid in item_pids if pid]):
+            for loan, params in loans_params:
+                try:
+                    with db.session.begin_nested():
+                        self.trigger(loan, **dict(params, trigger=trigger))
+                    results.append((loan, None))
+                except CirculationException as error:
+                    results.append((loan, error))
+        return results
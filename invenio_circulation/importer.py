@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Circulation bulk import of loans."""
+
+import uuid
+from datetime import datetime
+from itertools import islice
+
+from flask import current_app
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.models import RecordMetadata
+from jsonschema.exceptions import ValidationError
+
+from .api import Loan, get_document_pid_by_item_pid
+from .errors import InvalidLoanImportError
+from .models import ActiveLoan, DocumentLoansCount
+from .pidstore.pids import CIRCULATION_LOAN_PID_TYPE
+from .pidstore.providers import CirculationLoanIdProvider
+from .proxies import current_circulation
+
+
+def _chunks(iterable, size):
+    """Split the iterable in lists of the given size."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def _import_chunk(loans_data, validator, schema_url, offset=0):
+    """Insert a chunk of loans and return their ids.
+
+    :param offset: the number of loans imported before the chunk.
+    """
+    for index, data in enumerate(loans_data, start=offset + 1):
+        if "pid" in data:
+            raise InvalidLoanImportError(
+                index=index, reason="the `pid` is assigned by the import."
+            )
+
+    pid_values = CirculationLoanIdProvider.reserve(len(loans_data))
+    initial_state = current_app.config["CIRCULATION_LOAN_INITIAL_STATE"]
+    active_states = current_app.config["CIRCULATION_STATES_LOAN_ACTIVE"]
+    update_active_loans = current_app.config["CIRCULATION_ACTIVE_LOANS_TABLE"]
+    request_states = current_app.config["CIRCULATION_STATES_LOAN_REQUEST"]
+    update_counts = current_app.config["CIRCULATION_DOCUMENT_LOANS_COUNTS"]
+    now = datetime.utcnow()
+
+    records, pids, active_loans, counts = [], [], [], {}
+    for index, (data, pid_value) in enumerate(
+        zip(loans_data, pid_values), start=offset + 1
+    ):
+        data = dict(data, pid=pid_value)
+        data["$schema"] = schema_url
+        data.setdefault("state", initial_state)
+        if data.get("item_pid") and not data.get("document_pid"):
+            data["document_pid"] = get_document_pid_by_item_pid(
+                data["item_pid"]
+            )
+        Loan.build_resolver_fields(data)
+        try:
+            validator.validate(data)
+        except ValidationError as error:
+            raise InvalidLoanImportError(index=index, reason=error.message)
+
+        record_id = uuid.uuid4()
+        records.append(dict(
+            id=record_id, json=data, version_id=1, created=now, updated=now,
+        ))
+        pids.append(dict(
+            pid_type=CIRCULATION_LOAN_PID_TYPE,
+            pid_value=pid_value,
+            status=PIDStatus.REGISTERED,
+            object_type="rec",
+            object_uuid=record_id,
+            created=now,
+            updated=now,
+        ))
+        if update_active_loans and data.get("item_pid") and \
+                data["state"] in active_states:
+            active_loans.append(dict(
+                item_pid_type=data["item_pid"]["type"],
+                item_pid_value=data["item_pid"]["value"],
+                loan_id=record_id,
+            ))
+        if update_counts and data.get("document_pid"):
+            active, pending = counts.get(data["document_pid"], (0, 0))
+            counts[data["document_pid"]] = (
+                active + int(data["state"] in active_states),
+                pending + int(data["state"] in request_states),
+            )
+
+    db.session.execute(RecordMetadata.__table__.insert(), records)
+    db.session.execute(PersistentIdentifier.__table__.insert(), pids)
+    if active_loans:
+        db.session.execute(ActiveLoan.__table__.insert(), active_loans)
+    for document_pid, (active, pending) in counts.items():
+        if active or pending:
+            DocumentLoansCount.increment(
+                document_pid, active_loans=active, pending_requests=pending
+            )
+    return [str(record["id"]) for record in records]
+
+
+def import_loans(loans_data, chunk_size=500, index=True):
+    """Import many loans, bypassing the per record creation overhead.
+
+    The loans are imported in chunks: for each chunk, the PIDs are reserved
+    with one statement, the loans are validated with a JSON schema validator
+    built once, inserted with one statement per table and committed. The
+    imported loans are bulk indexed at the end.
+
+    When ``CIRCULATION_ACTIVE_LOANS_TABLE`` is enabled, the active loans are
+    added to the active loans table: importing an active loan on an item
+    that has already one aborts the import. When
+    ``CIRCULATION_DOCUMENT_LOANS_COUNTS`` is enabled, the counts of the
+    documents of the loans are updated.
+
+    Unlike `Loan.create`, the record signals are not sent and no record
+    version is stored. An invalid loan, or a loan with a `pid`, raises an
+    `InvalidLoanImportError` that aborts the import, leaving the previous
+    chunks committed.
+
+    :param loans_data: an iterable of loans data, without `pid`.
+    :param chunk_size: the number of loans inserted and committed at once.
+    :param index: whether to bulk index the imported loans.
+    :return: the number of imported loans.
+    """
+    schema_url = current_circulation.get_schema_url(Loan._schema)
+    validator = current_circulation.get_validator(schema_url)
+    indexer = current_circulation.loan_indexer()
+
+    count = 0
+    for chunk in _chunks(loans_data, chunk_size):
+        try:
+            record_ids = _import_chunk(
+                chunk, validator, schema_url, offset=count
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if index:
+            indexer.bulk_index(record_ids)
+        count += len(record_ids)
+
+    if index and count:
+        indexer.process_bulk_queue()
+    return count
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Circulation loans indexing."""
+
+from elasticsearch.helpers import bulk
+from flask import current_app, g
+
+from .proxies import current_circulation
+
+_LOANS_TO_INDEX = "circulation_loans_to_index"
+
+
+def index_loan(loan):
+    """Index the loan or defer it, depending on the indexing mode."""
+    mode = current_app.config["CIRCULATION_LOAN_INDEXING_MODE"]
+    if mode == "sync":
+        current_circulation.loan_indexer().index(loan)
+    else:
+        g.setdefault(_LOANS_TO_INDEX, set()).add(str(loan.id))
+
+
+def index_loans(loans):
+    """Index many loans or defer them, depending on the indexing mode.
+
+    In ``sync`` mode, the loans are indexed directly, without going through
+    the bulk indexing queue shared with the other indexers.
+    """
+    mode = current_app.config["CIRCULATION_LOAN_INDEXING_MODE"]
+    if mode != "sync":
+        g.setdefault(_LOANS_TO_INDEX, set()).update(
+            str(loan.id) for loan in loans
+        )
+        return
+
+    if not loans:
+        return
+    indexer = current_circulation.loan_indexer()
+    for loan in loans:
+        indexer.index(loan)
+
+
+def _bulk_index_loans(loan_ids):
+    """Index the given loans with bulk requests, bypassing the queue."""
+    indexer = current_circulation.loan_indexer()
+    return bulk(
+        indexer.client,
+        (
+            indexer._index_action(dict(id=loan_id, op="index"))
+            for loan_id in loan_ids
+        ),
+        stats_only=True,
+        request_timeout=current_app.config["INDEXER_BULK_REQUEST_TIMEOUT"],
+    )
+
+
+def flush_loans_index(exception=None):
+    """Bulk index the loans collected during the application context.
+
+    In ``bulk`` mode, only the collected loans are indexed: the bulk
+    indexing queue shared with the other indexers is not processed.
+    """
+    loan_ids = g.pop(_LOANS_TO_INDEX, None)
+    if not loan_ids:
+        return
+
+    if current_app.config["CIRCULATION_LOAN_INDEXING_MODE"] == "bulk":
+        _bulk_index_loans(loan_ids)
+    else:
+        current_circulation.loan_indexer().bulk_index(loan_ids)
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Circulation database models."""
+
+import uuid
+
+from invenio_db import db
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy_utils.models import Timestamp
+from sqlalchemy_utils.types import JSONType, UUIDType
+
+
+class ItemLock(db.Model):
+    """Lock of an item, taken when checking it out.
+
+    The row of an item is locked until the end of the database transaction
+    of the checkout, so that concurrent checkouts of the same item are
+    serialized. It records the last loan checked out on the item.
+    """
+
+    __tablename__ = "circulation_item_locks"
+
+    item_pid_type = db.Column(db.String(255), primary_key=True)
+    """Type of the item PID."""
+
+    item_pid_value = db.Column(db.String(255), primary_key=True)
+    """Value of the item PID."""
+
+    loan_id = db.Column(UUIDType, nullable=True)
+    """UUID of the last loan checked out on the item."""
+
+    @classmethod
+    def acquire(cls, item_pid):
+        """Lock the given item until the end of the database transaction.
+
+        :param item_pid: a dict containing `value` and `type` fields to
+            uniquely identify the item.
+        :return: the lock of the item.
+        """
+        key = (item_pid["type"], item_pid["value"])
+        # the row is read again even if already in the session, otherwise
+        # it would not be locked
+        lock = cls.query.with_for_update().populate_existing().get(key)
+        if lock:
+            return lock
+
+        try:
+            with db.session.begin_nested():
+                lock = cls(item_pid_type=key[0], item_pid_value=key[1])
+                db.session.add(lock)
+        except IntegrityError:
+            # created by a concurrent transaction in the meantime
+            lock = cls.query.with_for_update().populate_existing().get(key)
+        return lock
+
+
+class ActiveLoan(db.Model):
+    """Active loan of an item.
+
+    Maintained by the transitions in the same database transaction as the
+    loans, it allows at most one active loan per item.
+    """
+
+    __tablename__ = "circulation_active_loans"
+
+    item_pid_type = db.Column(db.String(255), primary_key=True)
+    """Type of the item PID."""
+
+    item_pid_value = db.Column(db.String(255), primary_key=True)
+    """Value of the item PID."""
+
+    loan_id = db.Column(UUIDType, nullable=False, unique=True)
+    """UUID of the active loan of the item."""
+
+    @classmethod
+    def get_by_item_pid(cls, item_pid):
+        """Return the active loan of the given item, if any.
+
+        :param item_pid: a dict containing `value` and `type` fields to
+            uniquely identify the item.
+        """
+        return cls.query.get((item_pid["type"], item_pid["value"]))
+
+    @classmethod
+    def get_by_item_pids(cls, item_pids):
+        """Return the active loans of the given items, with one query.
+
+        :param item_pids: a list of dicts containing `value` and `type` fields
+            to uniquely identify the items.
+        :return: a dict mapping the `(type, value)` item PID tuple of each
+            item on loan to its active loan.
+        """
+        values_by_type = {}
+        for item_pid in item_pids:
+            values_by_type.setdefault(item_pid["type"], set()).add(
+                item_pid["value"]
+            )
+        if not values_by_type:
+            return {}
+
+        query = cls.query.filter(or_(*[
+            and_(
+                cls.item_pid_type == pid_type,
+                cls.item_pid_value.in_(sorted(values)),
+            )
+            for pid_type, values in values_by_type.items()
+        ]))
+        return {
+            (active_loan.item_pid_type, active_loan.item_pid_value):
+                active_loan
+            for active_loan in query
+        }
+
+
+class DocumentLoansCount(db.Model):
+    """Number of active loans and pending requests of a document.
+
+    Maintained by the transitions in the same database transaction as the
+    loans, it gives the availability of many documents with one query.
+    """
+
+    __tablename__ = "circulation_document_loans_counts"
+
+    document_pid = db.Column(db.String(255), primary_key=True)
+    """PID of the document."""
+
+    active_loans = db.Column(db.Integer, nullable=False, default=0)
+    """Number of active loans on the items of the document."""
+
+    pending_requests = db.Column(db.Integer, nullable=False, default=0)
+    """Number of pending requests on the document."""
+
+    @classmethod
+    def increment(cls, document_pid, active_loans=0, pending_requests=0):
+        """Add the given numbers to the counts of a document.
+
+        The counts are updated with a single statement, so that concurrent
+        transactions do not overwrite each other's changes.
+
+        :param document_pid: the PID of the document.
+        :param active_loans: the number to add to the active loans, negative
+            to subtract.
+        :param pending_requests: the number to add to the pending requests,
+            negative to subtract.
+        """
+        values = dict(
+            active_loans=cls.active_loans + active_loans,
+            pending_requests=cls.pending_requests + pending_requests,
+        )
+        query = cls.query.filter_by(document_pid=document_pid)
+        if query.update(values, synchronize_session=False):
+            return
+
+        try:
+            with db.session.begin_nested():
+                db.session.add(cls(
+                    document_pid=document_pid,
+                    active_loans=active_loans,
+                    pending_requests=pending_requests,
+                ))
+        except IntegrityError:
+            # created by a concurrent transaction in the meantime
+            query.update(values, synchronize_session=False)
+
+    @classmethod
+    def get_by_document_pids(cls, document_pids):
+        """Return the counts of the given documents, with one query.
+
+        :param document_pids: a list of document PIDs.
+        :return: a dict mapping each document PID to its counts, if any.
+        """
+        if not document_pids:
+            return {}
+        query = cls.query.filter(cls.document_pid.in_(set(document_pids)))
+        return {counts.document_pid: counts for counts in query}
+
+
+class LoanActionTask(db.Model, Timestamp):
+    """Loan action executed asynchronously.
+
+    The task is identified by the idempotency key of the action request and
+    the user sending it, so that the action is executed once when the
+    request is sent again.
+    """
+
+    __tablename__ = "circulation_loan_action_tasks"
+
+    STATUS_PENDING = "PENDING"
+    STATUS_SUCCESS = "SUCCESS"
+    STATUS_FAILURE = "FAILURE"
+
+    id = db.Column(db.String(255), primary_key=True)
+    """Id of the task, built from the idempotency key and the user."""
+
+    idempotency_key = db.Column(db.String(255), nullable=False)
+    """Idempotency key of the action request."""
+
+    loan_pid = db.Column(db.String(255), nullable=False)
+    """PID of the loan."""
+
+    action = db.Column(db.String(255), nullable=False)
+    """Action triggered on the loan."""
+
+    params = db.Column(JSONType, nullable=False, default=dict)
+    """Parameters of the action."""
+
+    user_id = db.Column(db.Integer, nullable=True)
+    """Id of the user requesting the action, whose identity executes it."""
+
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING)
+    """Status of the task, pending until the action is executed."""
+
+    error = db.Column(JSONType, nullable=True)
+    """Error of the failed action."""
+
+    @staticmethod
+    def build_id(idempotency_key, user_id=None):
+        """Return the id of the task of an idempotency key sent by a user.
+
+        :param idempotency_key: the idempotency key of the action request.
+        :param user_id: the id of the user requesting the action, if any.
+        """
+        return str(uuid.uuid5(
+            uuid.NAMESPACE_URL,
+            "{0}:{1}".format(user_id or "", idempotency_key),
+        ))
+
+    @classmethod
+    def get_or_create(
+        cls, idempotency_key, loan_pid, action, params, user_id=None
+    ):
+        """Return the task of the given idempotency key, created if missing.
+
+        The idempotency keys are scoped to the user: the same key sent by
+        another user identifies another task.
+
+        :param idempotency_key: the idempotency key of the action request.
+        :param loan_pid: the PID of the loan.
+        :param action: the action triggered on the loan.
+        :param params: the parameters of the action.
+        :param user_id: the id of the user requesting the action, if any.
+        :return: a tuple `(task, created)`.
+        """
+        id_ = cls.build_id(idempotency_key, user_id)
+        task = cls.query.get(id_)
+        if task:
+            return task, False
+
+        try:
+            with db.session.begin_nested():
+                task = cls(
+                    id=id_, idempotency_key=idempotency_key,
+                    loan_pid=loan_pid, action=action, params=params,
+                    user_id=user_id, status=cls.STATUS_PENDING,
+                )
+                db.session.add(task)
+        except IntegrityError:
+            # created by a concurrent request in the meantime
+            return cls.query.get(id_), False
+        return task, True
+
+    def is_same_action(self, loan_pid, action, params):
+        """Return True if the task is the given action on the given loan."""
+        return (self.loan_pid, self.action, self.params) == \
+            (loan_pid, action, params)
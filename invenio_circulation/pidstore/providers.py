@@ -8,8 +8,10 @@
 
 """Circulation PID providers."""
 
-from invenio_pidstore.models import PIDStatus
+from invenio_db import db
+from invenio_pidstore.models import PIDStatus, RecordIdentifier
 from invenio_pidstore.providers.recordid import RecordIdProvider
+from sqlalchemy import text
 
 from .pids import CIRCULATION_LOAN_PID_TYPE
 
@@ -29,3 +31,30 @@ class CirculationLoanIdProvider(RecordIdProvider):
 
     default_status = PIDStatus.REGISTERED
     """Record IDs are by default registered immediately."""
+
+    @classmethod
+    def reserve(cls, count):
+        """Reserve a range of record identifiers.
+
+        On PostgreSQL, the identifiers are taken from the sequence with a
+        single statement. On the other databases, they are taken one by one
+        like when minting, so that concurrent minting cannot take the same
+        identifiers.
+
+        :param count: the number of identifiers to reserve.
+        :return: the list of reserved identifiers, as strings.
+        """
+        if count <= 0:
+            return []
+        if db.engine.dialect.name == "postgresql":
+            rows = db.session.execute(
+                text(
+                    "INSERT INTO pidstore_recid (recid) "
+                    "SELECT nextval('pidstore_recid_recid_seq') "
+                    "FROM generate_series(1, :count) RETURNING recid"
+                ),
+                dict(count=count),
+            )
+            return [str(recid) for recid in sorted(row[0] for row in rows)]
+
+        return [str(RecordIdentifier.next()) for _ in range(count)]
@@ -8,9 +8,151 @@
 
 """Circulation record loaders module."""
 
+from flask import request
 from invenio_records_rest.loaders import marshmallow_loader
+from invenio_records_rest.loaders.marshmallow import MarshmallowErrors
+from marshmallow import ValidationError
+from marshmallow import __version__ as marshmallow_version
 
+from ...api import get_loans_for_items
+from ...errors import InvalidLoanStateError, MissingRequiredParameterError
+from ...pidstore.fetchers import loan_pid_fetcher
+from ...proxies import current_circulation
 from .schemas.json import LoanReplaceItemSchemaV1, LoanSchemaV1
 
 loan_loader = marshmallow_loader(LoanSchemaV1)
 loan_replace_item_loader = marshmallow_loader(LoanReplaceItemSchemaV1)
+
+CHECKIN_LOAN_STATES = ["ITEM_ON_LOAN", "ITEM_IN_TRANSIT_TO_HOUSE"]
+"""States of the active loans that a checkin returns."""
+
+
+def _load(schema_class, data, context):
+    """Deserialize data with the given marshmallow schema."""
+    if int(marshmallow_version.split(".")[0]) < 3:
+        result = schema_class(context=context).load(data)
+        if result.errors:
+            raise MarshmallowErrors(result.errors)
+        return result.data
+    try:
+        return schema_class(context=context).load(data)
+    except ValidationError as error:
+        raise MarshmallowErrors(error.messages)
+
+
+def _load_loan_params(loan, data):
+    """Deserialize the action parameters of one loan of a batch.
+
+    :return: a `(loan, params, error)` tuple, where `error` is the validation
+        error of the parameters, if any.
+    """
+    context = dict(pid=loan_pid_fetcher(loan.id, loan), record=loan)
+    try:
+        return loan, _load(LoanSchemaV1, data, context), None
+    except MarshmallowErrors as error:
+        return loan, data, error
+
+
+def loans_batch_loader():
+    """Load the loans and the action parameters of a batch request.
+
+    The request body is a list of action parameters, each one with the `pid`
+    of the loan to perform the action on.
+
+    :return: a list of `(loan, params, error)` tuples, in the request order,
+        where `loan` is None when no loan exists with the given `pid` and
+        `error` is the validation error of the parameters, if any.
+    """
+    request_json = request.get_json()
+    if not isinstance(request_json, list) or \
+            not all(isinstance(data, dict) for data in request_json):
+        raise MissingRequiredParameterError(
+            description="A list of loan actions parameters is required."
+        )
+
+    loan_cls = current_circulation.loan_record_cls
+    loans, _ = loan_cls.get_records_by_pids(
+        [data.get("pid", "") for data in request_json]
+    )
+    loans_by_pid = {loan["pid"]: loan for loan in loans}
+
+    loans_params = []
+    for data in request_json:
+        loan = loans_by_pid.get(str(data.get("pid", "")))
+        if loan is None:
+            loans_params.append((None, data, None))
+            continue
+        loans_params.append(_load_loan_params(loan, data))
+    return loans_params
+
+
+def _is_valid_item_pid(item_pid):
+    """Return True if the given item PID has a `type` and a `value`."""
+    return isinstance(item_pid, dict) and all(
+        isinstance(item_pid.get(key), str) and item_pid[key]
+        for key in ("type", "value")
+    )
+
+
+def loans_checkin_loader():
+    """Load the active loans and the checkin parameters of returned items.
+
+    The request body is a list of checkin parameters, each one with the
+    `item_pid` of a returned item. The patron and the document of the loan
+    are used when not given. Only the loans in ``CHECKIN_LOAN_STATES`` can be
+    checked in: the `next` action on a loan at desk or in transit for pickup
+    would not return the item.
+
+    :return: a list of `(loan, params, error)` tuples, in the request order,
+        where `loan` is None when the item has no active loan, the item PID is
+        not valid or the item has multiple active loans, and `error` is the
+        error of the item or the validation error of the parameters, if any.
+    """
+    request_json = request.get_json()
+    if not isinstance(request_json, list) or \
+            not all(isinstance(data, dict) for data in request_json):
+        raise MissingRequiredParameterError(
+            description="A list of checkin parameters is required."
+        )
+
+    errors = {}
+    loans = get_loans_for_items([
+        data["item_pid"] for data in request_json
+        if _is_valid_item_pid(data.get("item_pid"))
+    ], errors=errors)
+
+    loans_params = []
+    for data in request_json:
+        item_pid = data.get("item_pid")
+        if not _is_valid_item_pid(item_pid):
+            error = MissingRequiredParameterError(
+                description="An `item_pid` with `type` and `value` is "
+                            "required."
+            )
+            loans_params.append((None, data, error))
+            continue
+        key = (item_pid["type"], item_pid["value"])
+        if key in errors:
+            loans_params.append((None, data, errors[key]))
+            continue
+        loan = loans.get(key)
+        if loan is None:
+            loans_params.append((None, data, None))
+            continue
+        if loan["state"] not in CHECKIN_LOAN_STATES:
+            msg = "Loan '{0}' in state '{1}' cannot be checked in.".format(
+                loan["pid"], loan["state"]
+            )
+            loans_params.append(
+                (loan, data, InvalidLoanStateError(description=msg))
+            )
+            continue
+        data = dict(
+            dict(
+                patron_pid=loan["patron_pid"],
+                document_pid=loan.get("document_pid"),
+            ),
+            **data
+        )
+        loans_params.append(_load_loan_params(loan, data))
+    return loans_params
@@ -9,11 +9,14 @@
 """Circulation search API."""
 
 from elasticsearch_dsl import VERSION as ES_VERSION
+from elasticsearch_dsl import Q
+from flask import current_app
 from invenio_search.api import RecordsSearch
 
 from invenio_circulation.errors import MissingRequiredParameterError
 
 from ..proxies import current_circulation
+from ..utils import str2datetime
 
 
 class LoansSearch(RecordsSearch):
@@ -72,6 +75,77 @@ def search_by_pid(
     return search
 
 
+def search_by_item_pids(item_pids, filter_states=None):
+    """Retrieve loans attached to any of the given items.
+
+    :param item_pids: a list of dicts containing `value` and `type` fields to
+        uniquely identify the items.
+    """
+    search_cls = current_circulation.loan_search_cls
+    search = search_cls()
+
+    values_by_type = {}
+    for item_pid in item_pids:
+        values_by_type.setdefault(item_pid["type"], set()).add(
+            item_pid["value"]
+        )
+    search = search.filter(
+        "bool",
+        should=[
+            Q(
+                "bool",
+                filter=[
+                    Q("term", item_pid__type=pid_type),
+                    Q("terms", item_pid__value=sorted(values)),
+                ],
+            )
+            for pid_type, values in values_by_type.items()
+        ],
+        minimum_should_match=1,
+    )
+
+    if filter_states:
+        search = search.filter("terms", state=filter_states)
+
+    return search
+
+
+def loans_exist(search):
+    """Return True if the given search matches at least one loan.
+
+    The `_count` API is used, stopping on each shard at the first matching
+    loan: no hits are fetched and no scores nor exact totals are computed.
+    """
+    return search.params(terminate_after=1).count() > 0
+
+
+def search_request_queue(document_pid):
+    """Retrieve the pending loans of a document, oldest request first.
+
+    :param document_pid: the PID of the document.
+    """
+    search_cls = current_circulation.loan_search_cls
+    return search_cls() \
+        .filter("term", document_pid=document_pid) \
+        .filter(
+            "terms",
+            state=current_app.config["CIRCULATION_STATES_LOAN_REQUEST"],
+        ) \
+        .sort({"transaction_date": {"order": "asc"}}, {"pid": "asc"})
+
+
+def search_overdue_loans(as_of):
+    """Retrieve the loans on loan with an end date before the given date.
+
+    :param as_of: a date, datetime or ISO-8601 string.
+    """
+    as_of_date = str2datetime(as_of).date().isoformat()
+    search_cls = current_circulation.loan_search_cls
+    return search_cls() \
+        .filter("term", state="ITEM_ON_LOAN") \
+        .filter("range", end_date=dict(lt=as_of_date))
+
+
 def search_by_patron_item_or_document(
     patron_pid, item_pid=None, document_pid=None, filter_states=None
 ):
@@ -25,3 +25,11 @@ loan_replace_item = _signals.signal('loan-replace-item')
 Broadcasted when the item in a Loan is replaced, sending the old and the new
 item_pid.
 """
+
+item_changed = _signals.signal('item-changed')
+"""Item changed signal.
+
+To be broadcasted by the host application when an item changes, e.g. when it
+is moved to another location or attached to another document, sending the
+item_pid. The results of the cached callbacks for the item are invalidated.
+"""
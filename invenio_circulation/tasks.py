@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Circulation Celery tasks."""
+
+import arrow
+from celery import shared_task
+from flask import g
+from flask_principal import AnonymousIdentity
+from invenio_access.utils import get_identity
+from invenio_accounts.models import User
+from invenio_db import db
+
+from .errors import CirculationException
+from .models import LoanActionTask
+from .proxies import current_circulation
+
+
+def _set_task_failure(task_id, error):
+    """Commit the failure of a loan action task."""
+    task = LoanActionTask.query.get(task_id)
+    task.status = LoanActionTask.STATUS_FAILURE
+    task.error = dict(
+        status=getattr(error, "code", 500),
+        message=getattr(error, "description", None) or str(error),
+        error_class=type(error).__name__,
+    )
+    db.session.commit()
+
+
+def _get_identity(user_id):
+    """Return the identity of the user requesting the action."""
+    user = User.query.get(user_id) if user_id else None
+    return get_identity(user) if user else AnonymousIdentity()
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10, acks_late=True)
+def trigger_loan_action(self, task_id):
+    """Trigger the action of a loan action task.
+
+    The task is locked while the action is executed, and its status is
+    committed with the loan: the action is executed once even when the task
+    is retried or delivered again, which is why the message is acknowledged
+    only when the task ends. A circulation error fails the task, other
+    errors are retried. The action is executed with the identity of the
+    user who requested it.
+
+    :param task_id: the id of the loan action task.
+    """
+    task = LoanActionTask.query.with_for_update().populate_existing() \
+        .get(task_id)
+    if task is None or task.status != LoanActionTask.STATUS_PENDING:
+        return
+
+    task.status = LoanActionTask.STATUS_SUCCESS
+    # restored for eager tasks, executed within the request
+    previous_identity = g.get("identity")
+    try:
+        g.identity = _get_identity(task.user_id)
+        loan = current_circulation.loan_record_cls.get_record_by_pid(
+            task.loan_pid
+        )
+        params = dict(task.params, trigger=task.action)
+        # the action is dated when requested, not when executed
+        params.setdefault(
+            "transaction_date", arrow.get(task.created).isoformat()
+        )
+        current_circulation.circulation.trigger(loan, **params)
+    except CirculationException as error:
+        db.session.rollback()
+        _set_task_failure(task_id, error)
+    except Exception as error:
+        db.session.rollback()
+        if self.request.retries >= self.max_retries:
+            _set_task_failure(task_id, error)
+            raise
+        raise self.retry(exc=error)
+    finally:
+        if previous_identity is None:
+            g.pop("identity", None)
+        else:
+            g.identity = previous_identity
@@ -14,15 +14,20 @@ from datetime import datetime
 import arrow
 from flask import current_app
 from invenio_db import db
+from invenio_records.models import RecordMetadata
 
-from ..api import Loan, is_item_available_for_checkout
+from ..api import Loan, is_item_available_for_checkout, update_active_loan, \
+    update_document_loans_counts
+from ..cache import get_callback, invalidate_request_cache
 from ..errors import DocumentDoNotMatchError, DocumentNotAvailableError, \
     InvalidLoanStateError, InvalidPermissionError, ItemNotAvailableError, \
     MissingRequiredParameterError, TransitionConditionsFailedError, \
     TransitionConstraintsViolationError
-from ..proxies import current_circulation
+from ..indexer import index_loan
+from ..models import ItemLock
 from ..signals import loan_state_changed
 from ..utils import str2datetime
+from .batch import current_batch
 
 
 def ensure_same_patron(f):
@@ -30,7 +35,7 @@ def ensure_same_patron(f):
     def inner(self, loan, **kwargs):
         new_patron_pid = kwargs.get("patron_pid")
 
-        if not current_app.config["CIRCULATION_PATRON_EXISTS"](new_patron_pid):
+        if not self.patron_exists(new_patron_pid):
             msg = "Patron '{0}' not found in the system".format(new_patron_pid)
             raise TransitionConstraintsViolationError(description=msg)
 
@@ -50,7 +55,7 @@ def ensure_same_document(f):
     def inner(self, loan, **kwargs):
         new_doc_pid = kwargs.get("document_pid")
 
-        if not current_app.config["CIRCULATION_DOCUMENT_EXISTS"](new_doc_pid):
+        if not self.document_exists(new_doc_pid):
             msg = "Document '{0}' not found in the system".format(new_doc_pid)
             raise DocumentNotAvailableError(description=msg)
 
@@ -126,6 +131,7 @@ class Transition(object):
         self.dest = dest
         self.trigger = trigger
         self.initial_loan = None
+        self.converted_date_fields = None
         self.permission_factory = (
             permission_factory
             or current_app.config[
@@ -133,6 +139,25 @@ class Transition(object):
             ]
         )
         self.validate_transition_states()
+        self.bind_config()
+
+    def bind_config(self):
+        """Bind the configured policies and callbacks to the transition.
+
+        The configuration is read once when the transition is built instead
+        of at each call, and read again by `reload_config` of the
+        circulation state machine.
+        """
+        config = current_app.config
+        self.policies = config["CIRCULATION_POLICIES"]
+        self.document_exists = config["CIRCULATION_DOCUMENT_EXISTS"]
+        self.patron_exists = get_callback("CIRCULATION_PATRON_EXISTS")
+        self.item_exists = get_callback("CIRCULATION_ITEM_EXISTS")
+        self.checkout_locking = config["CIRCULATION_CHECKOUT_LOCKING"]
+        self.active_loans_table = config["CIRCULATION_ACTIVE_LOANS_TABLE"]
+        self.document_loans_counts = config[
+            "CIRCULATION_DOCUMENT_LOANS_COUNTS"
+        ]
 
     def ensure_item_is_available_for_checkout(self, loan):
         """Validate that an item is available."""
@@ -140,16 +165,49 @@ class Transition(object):
             msg = "Item not set for loan #'{}'".format(loan["pid"])
             raise TransitionConstraintsViolationError(description=msg)
 
-        if not current_app.config["CIRCULATION_ITEM_EXISTS"](loan["item_pid"]):
+        if not self.item_exists(loan["item_pid"]):
             raise ItemNotAvailableError(
                 item_pid=loan["item_pid"], transition=self.dest
             )
 
-        if not is_item_available_for_checkout(loan["item_pid"]):
+        batch = current_batch()
+        if batch:
+            is_available = batch.is_item_available_for_checkout(
+                loan["item_pid"], loan_id=loan.id
+            )
+        else:
+            is_available = is_item_available_for_checkout(
+                loan["item_pid"], loan_id=loan.id
+            )
+        if not is_available:
             raise ItemNotAvailableError(
                 item_pid=loan["item_pid"], transition=self.dest
             )
 
+        if self.checkout_locking:
+            self.ensure_item_is_not_locked(loan)
+
+    def ensure_item_is_not_locked(self, loan):
+        """Lock the item and validate that its last loan is not active.
+
+        The item stays locked until the end of the database transaction, so
+        that concurrent checkouts see the committed loans.
+        """
+        lock = ItemLock.acquire(loan["item_pid"])
+        if lock.loan_id and lock.loan_id != loan.id:
+            # a locking read returns the last committed state of the loan,
+            # also with the repeatable read isolation level of MySQL
+            last_loan = RecordMetadata.query.with_for_update() \
+                .populate_existing().get(lock.loan_id)
+            active_states = current_app.config[
+                "CIRCULATION_STATES_LOAN_ACTIVE"
+            ]
+            if last_loan and last_loan.json.get("state") in active_states:
+                raise ItemNotAvailableError(
+                    item_pid=loan["item_pid"], transition=self.dest
+                )
+        lock.loan_id = loan.id
+
     def validate_transition_states(self):
         """Ensure that source and destination states are valid."""
         states = current_app.config["CIRCULATION_LOAN_TRANSITIONS"].keys()
@@ -167,7 +225,10 @@ class Transition(object):
 
     def before(self, loan, **kwargs):
         """Validate input, evaluate conditions and raise if failed."""
-        self.initial_loan = copy.deepcopy(loan)
+        # transitions replace loan fields instead of mutating them in place:
+        # a shallow copy is enough to keep the loan as it was before the
+        # transition, without deep copying embedded data and the DB model
+        self.initial_loan = copy.copy(loan)
         loan.update(kwargs)
         loan.setdefault("transaction_date", arrow.utcnow())
 
@@ -179,24 +240,62 @@ class Transition(object):
     def execute(self, loan, **kwargs):
         """Execute before actions, transition and after actions."""
         self._date_fields2datetime(kwargs)
-        loan.date_fields2datetime()
+        self.converted_date_fields = loan.date_fields2datetime()
 
         self.before(loan, **kwargs)
         loan["state"] = self.dest
         self.after(loan)
 
+    def update_related_loans(self, loan):
+        """Update other loans affected by the transition.
+
+        The updated loans are committed in the same database transaction of
+        the transitioned loan.
+
+        :param loan: the transitioned loan.
+        :return: the list of updated loans.
+        """
+        return []
+
     def after(self, loan):
-        """Commit record and index."""
-        self.initial_loan.date_fields2str()
-        loan.date_fields2str()
+        """Commit record and related loans in one transaction and index."""
+        # the date fields not changed by the transition are restored
+        self.initial_loan.date_fields2str(self.converted_date_fields)
+        loan.date_fields2str(self.converted_date_fields)
 
         loan.commit()
+        if self.active_loans_table:
+            update_active_loan(self.initial_loan, loan)
+        if self.document_loans_counts:
+            update_document_loans_counts(self.initial_loan, loan)
+        related_loans = self.update_related_loans(loan)
+
+        batch = current_batch()
+        if batch:
+            # committed when the batch of transitions ends
+            batch.add(self, self.initial_loan, loan, related_loans)
+            return
+
         db.session.commit()
-        current_circulation.loan_indexer().index(loan)
+        self.complete(self.initial_loan, loan, related_loans)
+
+    def complete(self, initial_loan, loan, related_loans):
+        """Index the committed loans and notify the state change."""
+        for _loan in [loan] + related_loans:
+            index_loan(_loan)
+        self.notify(initial_loan, loan, related_loans)
+
+    def notify(self, initial_loan, loan, related_loans):
+        """Notify the state change of the committed and indexed loan."""
+        invalidate_request_cache(item_pids=[
+            _loan["item_pid"]
+            for _loan in [initial_loan, loan] + related_loans
+            if _loan.get("item_pid")
+        ])
 
         loan_state_changed.send(
             self,
-            initial_loan=self.initial_loan,
+            initial_loan=initial_loan,
             loan=loan,
             trigger=self.trigger,
         )
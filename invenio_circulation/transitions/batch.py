@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Invenio Circulation batch of transitions."""
+
+from collections import OrderedDict
+
+from flask import current_app, g
+from invenio_db import db
+
+from ..api import get_document_pid_by_item_pid, get_pending_loans_by_doc_pid, \
+    is_item_available_for_checkout, is_items_available_for_checkout
+from ..cache import get_callback
+from ..indexer import index_loans
+
+_BATCH = "circulation_transitions_batch"
+
+
+def current_batch():
+    """Return the batch of transitions in progress, if any."""
+    return g.get(_BATCH)
+
+
+class TransitionsBatch(object):
+    """Batch of transitions committed, indexed and notified together.
+
+    While the batch is in progress, transitions do not commit: the loans are
+    committed with a single commit when the batch ends, then indexed and
+    the `loan_state_changed` signals are sent.
+
+    The pending requests of the documents of the returned items are assigned
+    once per document when the batch ends, to the last returned item.
+    """
+
+    def __init__(self, item_pids=None):
+        """Constructor.
+
+        :param item_pids: a list of dicts containing `value` and `type` fields
+            to uniquely identify the items of the loans in the batch. Their
+            availability for checkout and their location are retrieved at
+            once when needed.
+        """
+        self.item_pids = item_pids or []
+        self.availability = None
+        self.locations = None
+        self.unavailable = set()
+        self.pending_requests_items = OrderedDict()
+        self.completed = []
+
+    def __enter__(self):
+        """Start the batch."""
+        setattr(g, _BATCH, self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Commit, index and notify the completed transitions."""
+        g.pop(_BATCH, None)
+        if exc_type is not None:
+            db.session.rollback()
+            return
+
+        pending_loans = self.update_pending_requests()
+        db.session.commit()
+
+        loans = [loan for _, _, loan, _ in self.completed]
+        index_loans(loans + pending_loans)
+        for transition, initial_loan, loan, related_loans in self.completed:
+            transition.notify(initial_loan, loan, related_loans)
+
+    def is_item_available_for_checkout(self, item_pid, loan_id=None):
+        """Return True if the given item is available for loan.
+
+        :param item_pid: a dict containing `value` and `type` fields to
+            uniquely identify the item.
+        :param loan_id: the UUID of the loan to check out, if any: the item is
+            available when it is already attached to this active loan.
+        """
+        key = (item_pid["type"], item_pid["value"])
+        if key in self.unavailable:
+            return False
+        if self.availability is None:
+            self.availability = is_items_available_for_checkout(
+                self.item_pids
+            )
+        if key not in self.availability or \
+                (not self.availability[key] and loan_id is not None):
+            # the active loan of the item may be the loan to check out
+            return is_item_available_for_checkout(item_pid, loan_id=loan_id)
+        return self.availability[key]
+
+    def get_item_location(self, item_pid):
+        """Return the location PID of the given item.
+
+        The locations of all the items of the batch are retrieved at once
+        with ``CIRCULATION_ITEMS_LOCATION_RETRIEVER``, when defined.
+
+        :param item_pid: a dict containing `value` and `type` fields to
+            uniquely identify the item.
+        """
+        if self.locations is None:
+            self.locations = {}
+            get_locations = current_app.config[
+                "CIRCULATION_ITEMS_LOCATION_RETRIEVER"
+            ]
+            if get_locations and self.item_pids:
+                locations = get_locations(self.item_pids)
+                self.locations = {
+                    (pid["type"], pid["value"]): location_pid
+                    for pid, location_pid in zip(self.item_pids, locations)
+                }
+        key = (item_pid["type"], item_pid["value"])
+        if key not in self.locations:
+            self.locations[key] = get_callback(
+                "CIRCULATION_ITEM_LOCATION_RETRIEVER"
+            )(item_pid)
+        return self.locations[key]
+
+    def add_pending_requests_item(self, item_pid, document_pid=None):
+        """Assign the item to the pending requests of its document.
+
+        The pending requests are updated when the batch ends: when many items
+        of the same document are returned, the last one is assigned.
+
+        :param item_pid: a dict containing `value` and `type` fields to
+            uniquely identify the item.
+        :param document_pid: the PID of the document of the item, retrieved
+            with ``CIRCULATION_DOCUMENT_RETRIEVER_FROM_ITEM`` when not given.
+        """
+        document_pid = document_pid or get_document_pid_by_item_pid(item_pid)
+        self.pending_requests_items.pop(document_pid, None)
+        self.pending_requests_items[document_pid] = item_pid
+
+    def update_pending_requests(self):
+        """Update the pending requests once per document.
+
+        :return: the list of updated pending loans.
+        """
+        pending_loans = []
+        for document_pid, item_pid in self.pending_requests_items.items():
+            for pending_loan in get_pending_loans_by_doc_pid(document_pid):
+                pending_loan["item_pid"] = item_pid
+                pending_loan.commit()
+                pending_loans.append(pending_loan)
+        self.pending_requests_items.clear()
+        return pending_loans
+
+    def add(self, transition, initial_loan, loan, related_loans):
+        """Add a completed transition to the batch."""
+        self.completed.append((transition, initial_loan, loan, related_loans))
+
+        item_pid = loan.get("item_pid")
+        if item_pid:
+            key = (item_pid["type"], item_pid["value"])
+            active_states = current_app.config[
+                "CIRCULATION_STATES_LOAN_ACTIVE"
+            ]
+            if loan["state"] in active_states:
+                self.unavailable.add(key)
+            else:
+                self.unavailable.discard(key)
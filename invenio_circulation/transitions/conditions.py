@@ -8,7 +8,8 @@
 
 """Invenio Circulation transitions conditions."""
 
-from flask import current_app
+from ..cache import get_callback
+from .batch import current_batch
 
 
 def is_same_location(item_pid, input_location_pid):
@@ -17,7 +18,11 @@ def is_same_location(item_pid, input_location_pid):
     :param item_pid: a dict containing `value` and `type` fields to
         uniquely identify the item.
     """
-    item_location_pid = current_app.config[
-        "CIRCULATION_ITEM_LOCATION_RETRIEVER"
-    ](item_pid)
+    batch = current_batch()
+    if batch:
+        item_location_pid = batch.get_item_location(item_pid)
+    else:
+        item_location_pid = get_callback(
+            "CIRCULATION_ITEM_LOCATION_RETRIEVER"
+        )(item_pid)
     return input_location_pid == item_location_pid
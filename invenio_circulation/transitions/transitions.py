@@ -8,34 +8,27 @@
 
 """Invenio Circulation custom transitions."""
 
-from flask import current_app
-from invenio_db import db
-
-from invenio_circulation.proxies import current_circulation
-
 from ..api import can_be_requested, get_available_item_by_doc_pid, \
     get_document_pid_by_item_pid, get_pending_loans_by_doc_pid
+from ..cache import get_callback
 from ..errors import ItemDoNotMatchError, ItemNotAvailableError, \
     LoanMaxExtensionError, RecordCannotBeRequestedError, \
     TransitionConditionsFailedError, TransitionConstraintsViolationError
 from ..transitions.base import Transition
+from ..transitions.batch import current_batch
 from ..transitions.conditions import is_same_location
 
 
-def _ensure_valid_loan_duration(loan, initial_loan):
+def _ensure_valid_loan_duration(loan, initial_loan, checkout_policies):
     """Validate start and end dates for a loan."""
     loan.setdefault("start_date", loan["transaction_date"])
 
     if not loan.get("end_date"):
-        get_loan_duration = current_app.config["CIRCULATION_POLICIES"][
-            "checkout"
-        ]["duration_default"]
+        get_loan_duration = checkout_policies["duration_default"]
         duration = get_loan_duration(loan, initial_loan)
         loan["end_date"] = loan["start_date"] + duration
 
-    is_duration_valid = current_app.config["CIRCULATION_POLICIES"]["checkout"][
-        "duration_validate"
-    ]
+    is_duration_valid = checkout_policies["duration_validate"]
     if not is_duration_valid(loan):
         msg = "The loan duration from '{0}' to '{1}' is not valid.".format(
             loan["start_date"].isoformat(), loan["end_date"].isoformat()
@@ -56,7 +49,7 @@ def ensure_same_item(f):
         item_pid = kwargs.get("item_pid")
 
         if item_pid:
-            if not current_app.config["CIRCULATION_ITEM_EXISTS"](item_pid):
+            if not self.item_exists(item_pid):
                 msg = "Item '{0}:{1}' not found in the system".format(
                     item_pid["type"], item_pid["value"]
                 )
@@ -84,18 +77,31 @@ def ensure_same_item(f):
     return inner
 
 
-def _update_document_pending_request_for_item(item_pid, **kwargs):
+def _update_document_pending_request_for_item(
+    item_pid, document_pid=None, **kwargs
+):
     """Update pending loans on a Document with no Item attached yet.
 
+    The loans are not committed to the database. In a batch of transitions,
+    the loans are updated once per document when the batch ends.
+
     :param item_pid: a dict containing `value` and `type` fields to
         uniquely identify the item.
+    :param document_pid: the PID of the document of the item, if known.
+    :return: the list of updated pending loans.
     """
-    document_pid = get_document_pid_by_item_pid(item_pid)
+    batch = current_batch()
+    if batch:
+        batch.add_pending_requests_item(item_pid, document_pid=document_pid)
+        return []
+
+    document_pid = document_pid or get_document_pid_by_item_pid(item_pid)
+    pending_loans = []
     for pending_loan in get_pending_loans_by_doc_pid(document_pid):
         pending_loan["item_pid"] = item_pid
         pending_loan.commit()
-        db.session.commit()
-        current_circulation.loan_indexer().index(pending_loan)
+        pending_loans.append(pending_loan)
+    return pending_loans
 
 
 def _ensure_same_location(item_pid, location_pid, destination, error_msg):
@@ -114,7 +120,10 @@ def _ensure_not_same_location(item_pid, location_pid, destination, error_msg):
 
 def _get_item_location(item_pid):
     """Retrieve Item location based on PID."""
-    return current_app.config["CIRCULATION_ITEM_LOCATION_RETRIEVER"](item_pid)
+    batch = current_batch()
+    if batch:
+        return batch.get_item_location(item_pid)
+    return get_callback("CIRCULATION_ITEM_LOCATION_RETRIEVER")(item_pid)
 
 
 class ToItemOnLoan(Transition):
@@ -133,7 +142,9 @@ class ToItemOnLoan(Transition):
         if no_pickup:
             loan["pickup_location_pid"] = _get_item_location(loan["item_pid"])
 
-        _ensure_valid_loan_duration(loan, self.initial_loan)
+        _ensure_valid_loan_duration(
+            loan, self.initial_loan, self.policies["checkout"]
+        )
 
 
 class ItemAtDeskToItemOnLoan(ToItemOnLoan):
@@ -142,7 +153,9 @@ class ItemAtDeskToItemOnLoan(ToItemOnLoan):
     def before(self, loan, **kwargs):
         """Validate checkout action."""
         super().before(loan, **kwargs)
-        _ensure_valid_loan_duration(loan, self.initial_loan)
+        _ensure_valid_loan_duration(
+            loan, self.initial_loan, self.policies["checkout"]
+        )
 
 
 def check_request_on_document(f):
@@ -242,9 +255,7 @@ class ItemOnLoanToItemOnLoan(Transition):
         extension_count = loan.get("extension_count", 0)
         extension_count += 1
 
-        get_extension_max_count_func = current_app.config[
-            "CIRCULATION_POLICIES"
-        ]["extension"]["max_count"]
+        get_extension_max_count_func = self.policies["extension"]["max_count"]
         extension_max_count = get_extension_max_count_func(loan)
         if extension_count > extension_max_count:
             raise LoanMaxExtensionError(
@@ -254,14 +265,11 @@ class ItemOnLoanToItemOnLoan(Transition):
 
     def update_loan_end_date(self, loan):
         """Update the end date of the extended loan."""
-        get_extension_duration_func = current_app.config[
-            "CIRCULATION_POLICIES"
-        ]["extension"]["duration_default"]
+        extension_policies = self.policies["extension"]
+        get_extension_duration_func = extension_policies["duration_default"]
         duration = get_extension_duration_func(loan, self.initial_loan)
 
-        should_extend_from_end_date = current_app.config[
-            "CIRCULATION_POLICIES"
-        ]["extension"]["from_end_date"]
+        should_extend_from_end_date = extension_policies["from_end_date"]
         if not should_extend_from_end_date:
             # extend from the transaction_date instead
             loan["end_date"] = loan["transaction_date"]
@@ -326,11 +334,13 @@ class ItemOnLoanToItemReturned(Transition):
         # set end loan date as transaction date when completing loan
         loan["end_date"] = loan["transaction_date"]
 
-    def after(self, loan):
+    def update_related_loans(self, loan):
         """Check for pending requests on this item after check-in."""
-        super().after(loan)
         if self.assign_item:
-            _update_document_pending_request_for_item(loan["item_pid"])
+            return _update_document_pending_request_for_item(
+                loan["item_pid"], document_pid=loan.get("document_pid")
+            )
+        return []
 
 
 class ItemInTransitHouseToItemReturned(Transition):
@@ -361,11 +371,13 @@ class ItemInTransitHouseToItemReturned(Transition):
             error_msg="Item should be in transit to house.",
         )
 
-    def after(self, loan):
+    def update_related_loans(self, loan):
         """Check for pending requests on this item after check-in."""
-        super().after(loan)
         if self.assign_item:
-            _update_document_pending_request_for_item(loan["item_pid"])
+            return _update_document_pending_request_for_item(
+                loan["item_pid"], document_pid=loan.get("document_pid")
+            )
+        return []
 
 
 class ToCancelled(Transition):
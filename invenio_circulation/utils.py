@@ -8,6 +8,7 @@
 
 """Circulation API."""
 
+import re
 
 import arrow
 
@@ -150,6 +151,28 @@ def transaction_user_validator(transaction_user_pid):
     )
 
 
+_ISO_DATE_RE = re.compile(
+    r"^(\d{4})-(\d{2})-(\d{2})"
+    r"(?:T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?(Z|[+-]00:00)?)?$"
+)
+"""ISO-8601 UTC dates and datetimes, as serialized in loans."""
+
+
 def str2datetime(str_date):
-    """Parse string date with timezone and return a datetime object."""
-    return arrow.get(str_date).to('utc')
+    """Parse string date with timezone and return a datetime object.
+
+    UTC dates and datetimes in the ISO-8601 formats used by loans are parsed
+    without going through the `arrow` parser, which is slow.
+    """
+    match = _ISO_DATE_RE.match(str_date) if isinstance(str_date, str) \
+        else None
+    if not match:
+        return arrow.get(str_date).to('utc')
+
+    year, month, day, hour, minute, second, fraction, _ = match.groups()
+    if hour is None:
+        return arrow.Arrow(int(year), int(month), int(day))
+    return arrow.Arrow(
+        int(year), int(month), int(day), int(hour), int(minute), int(second),
+        int(fraction.ljust(6, "0")) if fraction else 0,
+    )
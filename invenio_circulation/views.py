@@ -8,21 +8,31 @@
 
 """Circulation views."""
 
-from copy import deepcopy
+import uuid
+from copy import copy, deepcopy
 
-from flask import Blueprint, current_app, request, url_for
+from flask import Blueprint, abort, current_app, jsonify, request, url_for
+from flask_login import current_user
 from invenio_db import db
+from invenio_pidstore.errors import PersistentIdentifierError
+from invenio_records_rest import current_records_rest
 from invenio_records_rest.utils import obj_or_import_string
 from invenio_records_rest.views import pass_record
 from invenio_rest import ContentNegotiatedMethodView
 
-from .errors import InvalidLoanStateError, ItemNotAvailableError, \
-    MissingRequiredParameterError
+from .api import update_active_loan
+from .cache import get_callback, invalidate_request_cache
+from .errors import IdempotencyKeyReusedError, InvalidLoanStateError, \
+    ItemNotAvailableError, MissingRequiredParameterError
+from .indexer import index_loan
+from .models import LoanActionTask
 from .permissions import need_permissions
 from .pidstore.pids import _LOANID_CONVERTER, CIRCULATION_LOAN_PID_TYPE
 from .proxies import current_circulation
-from .records.loaders import loan_loader, loan_replace_item_loader
+from .records.loaders import loan_loader, loan_replace_item_loader, \
+    loans_batch_loader, loans_checkin_loader
 from .signals import loan_replace_item
+from .tasks import trigger_loan_action
 
 
 def extract_transitions_from_app(app):
@@ -45,6 +55,17 @@ def build_url_action_for_pid(pid, action):
     )
 
 
+def build_url_action_task(task):
+    """Build the url of the status of a loan action task."""
+    return url_for(
+        "invenio_circulation_loan_actions.{0}_action_tasks".format(
+            CIRCULATION_LOAN_PID_TYPE
+        ),
+        task_id=task.id,
+        _external=True,
+    )
+
+
 def _get_loan_endpoint_options(app):
     """Return the configured endpoint options."""
     endpoints = app.config.get("CIRCULATION_REST_ENDPOINTS", [])
@@ -84,6 +105,40 @@ def create_loan_actions_blueprint(app):
     )
 
     blueprint.add_url_rule(url, view_func=loan_actions, methods=["POST"])
+
+    _, batch_view_options = _get_loan_endpoint_options(app)
+    batch_view_options["ctx"]["loader"] = loans_batch_loader
+    loans_batch_actions = LoansBatchActionResource.as_view(
+        LoansBatchActionResource.view_name.format(CIRCULATION_LOAN_PID_TYPE),
+        **batch_view_options
+    )
+    batch_url = "{0}actions/<any({1}):action>".format(
+        all_options["list_route"], ",".join(distinct_actions)
+    )
+    blueprint.add_url_rule(
+        batch_url, view_func=loans_batch_actions, methods=["POST"]
+    )
+
+    _, checkin_view_options = _get_loan_endpoint_options(app)
+    checkin_view_options["ctx"]["loader"] = loans_checkin_loader
+    loans_checkin = LoansCheckinResource.as_view(
+        LoansCheckinResource.view_name.format(CIRCULATION_LOAN_PID_TYPE),
+        **checkin_view_options
+    )
+    blueprint.add_url_rule(
+        "{0}checkin".format(all_options["list_route"]),
+        view_func=loans_checkin,
+        methods=["POST"],
+    )
+
+    loan_action_tasks = LoanActionTaskResource.as_view(
+        LoanActionTaskResource.view_name.format(CIRCULATION_LOAN_PID_TYPE)
+    )
+    blueprint.add_url_rule(
+        "{0}actions/tasks/<path:task_id>".format(all_options["list_route"]),
+        view_func=loan_action_tasks,
+        methods=["GET"],
+    )
     return blueprint
 
 
@@ -103,10 +158,12 @@ class LoanActionResource(ContentNegotiatedMethodView):
     def post(self, pid, record, action, **kwargs):
         """Handle loan action."""
         data = self.loader()
+        if action in current_app.config["CIRCULATION_LOAN_ACTIONS_ASYNC"]:
+            return self.enqueue(record, action, data)
+
         record = current_circulation.circulation.trigger(
             record, **dict(data, trigger=action)
         )
-        db.session.commit()
         return self.make_response(
             pid,
             record,
@@ -116,6 +173,194 @@ class LoanActionResource(ContentNegotiatedMethodView):
             ),
         )
 
+    def enqueue(self, record, action, params):
+        """Trigger the action asynchronously and return the task status.
+
+        The task is enqueued again while it is pending, so that sending the
+        request again recovers a task lost before being executed.
+        """
+        current_circulation.circulation.check_permission(
+            record, trigger=action
+        )
+        key = request.headers.get("Idempotency-Key") or str(uuid.uuid4())
+        task, _ = LoanActionTask.get_or_create(
+            key, record["pid"], action, params,
+            user_id=current_user.id if current_user.is_authenticated else None,
+        )
+        if not task.is_same_action(record["pid"], action, params):
+            raise IdempotencyKeyReusedError(key=key)
+        db.session.commit()
+
+        if task.status == LoanActionTask.STATUS_PENDING:
+            trigger_loan_action.delay(task.id)
+        return loan_action_task_responsify(
+            task, 202, headers=[("Location", build_url_action_task(task))]
+        )
+
+
+def loan_action_task_responsify(task, code=200, headers=None):
+    """Serialize a loan action task to a JSON response."""
+    response = jsonify(dict(
+        id=task.id,
+        idempotency_key=task.idempotency_key,
+        loan_pid=task.loan_pid,
+        action=task.action,
+        status=task.status,
+        error=task.error,
+        links=dict(self=build_url_action_task(task)),
+    ))
+    response.status_code = code
+    if headers:
+        response.headers.extend(headers)
+    return response
+
+
+class LoanActionTaskResource(ContentNegotiatedMethodView):
+    """Loan action task status resource."""
+
+    view_name = "{0}_action_tasks"
+
+    def __init__(self, *args, **kwargs):
+        """Constructor."""
+        super().__init__(
+            serializers={"application/json": loan_action_task_responsify},
+            default_media_type="application/json",
+            *args,
+            **kwargs
+        )
+
+    def can_read(self, task):
+        """Return True if the current user can read the task.
+
+        The user who requested the action can read its task, otherwise the
+        permission to read the loan is required.
+        """
+        if current_user.is_authenticated and task.user_id == current_user.id:
+            return True
+        try:
+            loan = current_circulation.loan_record_cls.get_record_by_pid(
+                task.loan_pid
+            )
+        except PersistentIdentifierError:
+            return False
+        endpoint = current_circulation._get_endpoint_config()
+        permission_factory = obj_or_import_string(
+            endpoint.get("read_permission_factory_imp"),
+            default=current_records_rest.read_permission_factory,
+        )
+        return permission_factory(record=loan).can()
+
+    @need_permissions("loan-actions")
+    def get(self, task_id, **kwargs):
+        """Return the status of a loan action task."""
+        task = LoanActionTask.query.get_or_404(task_id)
+        if not self.can_read(task):
+            abort(404)
+        return self.make_response(task)
+
+
+class LoansBatchActionResource(ContentNegotiatedMethodView):
+    """Loans batch action resource."""
+
+    view_name = "{0}_batch_actions"
+
+    def __init__(self, serializers, ctx, *args, **kwargs):
+        """Constructor."""
+        super().__init__(serializers, *args, **kwargs)
+        for key, value in ctx.items():
+            setattr(self, key, value)
+
+    def not_found_hit(self, params):
+        """Return the result of an action on a not found loan."""
+        return dict(
+            pid=params.get("pid"),
+            status=404,
+            message="Loan '{}' not found.".format(params.get("pid")),
+        )
+
+    def hit_id(self, loan, params):
+        """Return the fields identifying the loan in its result."""
+        return dict(pid=loan["pid"] if loan else params.get("pid"))
+
+    def error_hit(self, loan, params, error):
+        """Return the result of an action that failed on a loan."""
+        hit = dict(
+            self.hit_id(loan, params),
+            status=error.code,
+            message=error.description,
+            error_class=type(error).__name__,
+        )
+        errors = error.get_errors()
+        if errors:
+            hit["errors"] = errors
+        return hit
+
+    def trigger_many(self, action):
+        """Trigger the action on the loaded loans and return the results.
+
+        The response is ``200 OK`` when the action succeeded on all the
+        loans, ``207 Multi-Status`` otherwise, with the result of each loan.
+        """
+        loans_params = self.loader()
+        valid = [
+            (loan, params)
+            for loan, params, error in loans_params
+            if loan and not error
+        ]
+        results = iter(current_circulation.circulation.trigger_many(
+            valid, trigger=action
+        ))
+
+        hits = []
+        for loan, params, error in loans_params:
+            if not loan and not error:
+                hits.append(self.not_found_hit(params))
+                continue
+            if not error:
+                loan, error = next(results)
+            if error:
+                hits.append(self.error_hit(loan, params, error))
+            else:
+                hits.append(dict(
+                    pid=loan["pid"], status=200, metadata=dict(loan)
+                ))
+        status = 200 if all(hit["status"] == 200 for hit in hits) else 207
+        return jsonify(dict(hits=hits)), status
+
+    @need_permissions("loan-actions")
+    def post(self, action, **kwargs):
+        """Handle the same action on many loans."""
+        return self.trigger_many(action)
+
+
+class LoansCheckinResource(LoansBatchActionResource):
+    """Loans bulk checkin resource."""
+
+    view_name = "{0}_checkin"
+
+    def hit_id(self, loan, params):
+        """Return the fields identifying the item and its loan."""
+        hit_id = dict(item_pid=params.get("item_pid"))
+        if loan:
+            hit_id["pid"] = loan["pid"]
+        return hit_id
+
+    def not_found_hit(self, params):
+        """Return the result of the checkin of an item not on loan."""
+        item_pid = params["item_pid"]
+        return dict(
+            item_pid=item_pid,
+            status=404,
+            message="No active loan found for item '{0}:{1}'.".format(
+                item_pid.get("type"), item_pid.get("value")
+            ),
+        )
+
+    @need_permissions("loan-actions")
+    def post(self, **kwargs):
+        """Checkin the returned items."""
+        return self.trigger_many("next")
+
 
 def create_loan_replace_item_blueprint(app):
     """Create a blueprint for replacing Loan Item."""
@@ -158,7 +403,7 @@ def validate_replace_item(loan, new_item_pid):
             description="Parameter 'new_item_pid' is required."
         )
 
-    item_exists_func = current_app.config["CIRCULATION_ITEM_EXISTS"]
+    item_exists_func = get_callback("CIRCULATION_ITEM_EXISTS")
     if not item_exists_func(new_item_pid):
         raise ItemNotAvailableError(item_pid=new_item_pid)
 
@@ -183,11 +428,17 @@ class LoanReplaceItemResource(ContentNegotiatedMethodView):
         new_item_pid = data.get("item_pid")
 
         validate_replace_item(record, new_item_pid)
+        initial_record = copy(record)
         record.update_item_ref(new_item_pid)
 
         record.commit()
+        if current_app.config["CIRCULATION_ACTIVE_LOANS_TABLE"]:
+            update_active_loan(initial_record, record)
         db.session.commit()
-        current_circulation.loan_indexer().index(record)
+        index_loan(record)
+        invalidate_request_cache(
+            item_pids=[pid for pid in (old_item_pid, new_item_pid) if pid]
+        )
 
         if old_item_pid:
             loan_replace_item.send(self, old_item_pid=old_item_pid,
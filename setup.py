@@ -76,8 +76,10 @@ install_requires = [
     'arrow>=0.15.0',
     'invenio-base>=1.2.1',
     'invenio-access>=1.3.1',
+    'invenio-celery>=1.1.0',
     'invenio-logging>=1.2.1',
     'invenio-pidstore>=1.1.0',
+    # records are validated with `Record.validate` up to 1.3
     'invenio-records-rest>=1.6.4',
     'invenio-jsonschemas>=1.0.1',
 ]
@@ -113,6 +115,18 @@ setup(
         'invenio_base.api_apps': [
             'invenio_circulation = invenio_circulation:InvenioCirculation'
         ],
+        'invenio_db.alembic': [
+            'invenio_circulation = invenio_circulation:alembic',
+        ],
+        'invenio_db.models': [
+            'invenio_circulation = invenio_circulation.models',
+        ],
+        'flask.commands': [
+            'circulation = invenio_circulation.cli:circulation',
+        ],
+        'invenio_celery.tasks': [
+            'invenio_circulation = invenio_circulation.tasks',
+        ],
         'invenio_base.api_blueprints': [
             'invenio_circulation_loan_actions = '
             'invenio_circulation.views:create_loan_actions_blueprint',
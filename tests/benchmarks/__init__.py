@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Micro-benchmarks for Invenio-Circulation.
+
+Run a benchmark module directly, e.g.::
+
+    python -m tests.benchmarks.bench_transitions_dispatch
+"""
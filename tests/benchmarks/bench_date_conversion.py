@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark the date fields conversion done by each transition.
+
+A transition converts the date fields of the loan to datetimes before
+running, then converts the loan and the initial loan back to strings. The
+former conversion, parsing all the fields with `arrow` and serializing all
+of them back, is compared with the fast ISO-8601 parser and the restore of
+the fields not changed by the transition.
+"""
+
+import timeit
+from copy import copy
+from datetime import timedelta
+
+import arrow
+from flask import Flask
+
+from invenio_circulation import InvenioCirculation
+from invenio_circulation.api import Loan
+
+NUMBER = 10000
+
+LOAN = dict(
+    pid="1",
+    state="ITEM_ON_LOAN",
+    transaction_date="2020-01-01T10:00:00+00:00",
+    start_date="2020-01-01",
+    end_date="2020-01-31",
+    request_start_date="2019-12-20",
+    request_expire_date="2020-02-20",
+)
+
+
+def _arrow_round_trip(loan):
+    """Convert the dates of a loan and back, as transitions used to do."""
+    fields = Loan.DATE_FIELDS + Loan.DATETIME_FIELDS
+    for field in fields:
+        if field in loan:
+            loan[field] = arrow.get(loan[field]).to("utc")
+    initial_loan = copy(loan)
+    loan["end_date"] += timedelta(days=7)
+    for _loan in (initial_loan, loan):
+        for field in Loan.DATE_FIELDS:
+            if field in _loan:
+                _loan[field] = _loan[field].date().isoformat()
+        for field in Loan.DATETIME_FIELDS:
+            if field in _loan:
+                _loan[field] = _loan[field].isoformat()
+
+
+def _round_trip(loan):
+    """Convert the dates of a loan and back, as transitions do."""
+    converted = loan.date_fields2datetime()
+    initial_loan = copy(loan)
+    loan["end_date"] += timedelta(days=7)
+    initial_loan.date_fields2str(converted)
+    loan.date_fields2str(converted)
+
+
+def run():
+    """Run the benchmark and print the results."""
+    app = Flask("bench_date_conversion")
+    InvenioCirculation(app)
+    with app.app_context():
+        print("{0:<30} {1:>12}".format("conversion", "per transition (us)"))
+        for name, func in (("arrow", _arrow_round_trip),
+                           ("fast path", _round_trip)):
+            elapsed = timeit.timeit(
+                lambda: func(Loan(dict(LOAN))), number=NUMBER
+            )
+            print("{0:<30} {1:>12.3f}".format(name, elapsed / NUMBER * 1e6))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark the JSON schema validation of a loan on commit.
+
+The validation done by `Loan.commit` is measured with the default
+invenio-records validation, building the validator and checking the schema
+at each call, and with the cached validator enabled by
+``CIRCULATION_LOAN_CACHED_VALIDATOR``. The database write is left out, being
+the same in both cases.
+"""
+
+import timeit
+from os.path import dirname, join
+
+from flask import Flask
+from invenio_jsonschemas import InvenioJSONSchemas
+from invenio_records import InvenioRecords
+
+import invenio_circulation
+from invenio_circulation import InvenioCirculation
+from invenio_circulation.api import Loan
+
+NUMBER = 2000
+
+
+def _loan(app):
+    """Return a loan in a typical state."""
+    return Loan(dict(
+        {"$schema": app.extensions["invenio-circulation"].get_schema_url(
+            Loan._schema
+        )},
+        pid="1",
+        state="ITEM_ON_LOAN",
+        patron_pid="patron_pid",
+        document_pid="document_pid",
+        item_pid=dict(type="itemid", value="item_pid"),
+        transaction_location_pid="loc_pid",
+        transaction_user_pid="user_pid",
+        transaction_date="2020-01-01T10:00:00+00:00",
+        start_date="2020-01-01",
+        end_date="2020-01-31",
+        extension_count=0,
+    ))
+
+
+def run():
+    """Run the benchmark and print the results."""
+    app = Flask("bench_loan_validation")
+    app.config.update(
+        JSONSCHEMAS_HOST="localhost",
+        JSONSCHEMAS_REGISTER_ENDPOINTS_API=False,
+        JSONSCHEMAS_REGISTER_ENDPOINTS_UI=False,
+    )
+    jsonschemas = InvenioJSONSchemas(app, entry_point_group=None)
+    jsonschemas.register_schemas_dir(
+        join(dirname(invenio_circulation.__file__), "schemas")
+    )
+    InvenioRecords(app)
+    InvenioCirculation(app)
+
+    with app.app_context():
+        loan = _loan(app)
+        print("{0:<30} {1:>12}".format("validator", "commit (us)"))
+        for cached in (False, True):
+            app.config["CIRCULATION_LOAN_CACHED_VALIDATOR"] = cached
+            elapsed = timeit.timeit(loan.validate, number=NUMBER)
+            print("{0:<30} {1:>12.3f}".format(
+                "cached" if cached else "invenio-records",
+                elapsed / NUMBER * 1e6,
+            ))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark the per-trigger overhead of the circulation state machine.
+
+The body of each transition is replaced with a no-op so that only the
+dispatch cost is measured: the former linear scan over all the transitions
+of the current state, relying on `check_trigger` to raise for non-matching
+triggers, is compared with the `(state, trigger)` index lookup.
+"""
+
+import timeit
+from copy import deepcopy
+from functools import partial
+
+from flask import Flask
+
+from invenio_circulation import InvenioCirculation
+from invenio_circulation.errors import NoValidTransitionAvailableError, \
+    TransitionConditionsFailedError
+from invenio_circulation.ext import _Circulation
+from invenio_circulation.transitions.base import check_trigger
+
+NUMBER = 100000
+
+
+def _noop(self, loan, **kwargs):
+    """Transition body doing nothing."""
+
+
+def _linear_scan_trigger(circulation, loan, **kwargs):
+    """Dispatch by trying all the transitions of the current state."""
+    current_state = loan.get("state")
+    circulation._validate_current_state(current_state)
+    for t in circulation.transitions[current_state]:
+        try:
+            t.execute(loan, **kwargs)
+            return loan
+        except TransitionConditionsFailedError:
+            pass
+    raise NoValidTransitionAvailableError(
+        loan_pid=loan["pid"], state=current_state
+    )
+
+
+def run():
+    """Run the benchmark and print the results."""
+    app = Flask("bench_transitions_dispatch")
+    InvenioCirculation(app)
+    with app.app_context():
+        circulation = _Circulation(
+            transitions_config=deepcopy(
+                app.config["CIRCULATION_LOAN_TRANSITIONS"]
+            )
+        )
+        for transitions in circulation.transitions.values():
+            for t in transitions:
+                t.execute = partial(check_trigger(_noop), t)
+
+        cases = [
+            ("ITEM_ON_LOAN", "next"),
+            ("ITEM_ON_LOAN", "extend"),
+            ("ITEM_ON_LOAN", "cancel"),
+            ("PENDING", "cancel"),
+        ]
+        print("{0:<30} {1:>12} {2:>12}".format(
+            "state/trigger", "scan (us)", "index (us)"))
+        for state, trigger in cases:
+            loan = dict(pid="1", state=state)
+            before = timeit.timeit(
+                lambda: _linear_scan_trigger(
+                    circulation, loan, trigger=trigger),
+                number=NUMBER,
+            )
+            after = timeit.timeit(
+                lambda: circulation.trigger(loan, trigger=trigger),
+                number=NUMBER,
+            )
+            print("{0:<30} {1:>12.3f} {2:>12.3f}".format(
+                "{0}/{1}".format(state, trigger),
+                before / NUMBER * 1e6,
+                after / NUMBER * 1e6,
+            ))
+
+
+if __name__ == "__main__":
+    run()
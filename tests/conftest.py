@@ -151,8 +151,17 @@ def mock_is_item_available_for_checkout():
     """Mock item_available check."""
     path = \
         "invenio_circulation.api.is_item_available_for_checkout"
-    with mock.patch(path) as mock_is_item_available_for_checkout:
+    bulk_path = \
+        "invenio_circulation.api.is_items_available_for_checkout"
+    with mock.patch(path) as mock_is_item_available_for_checkout, \
+            mock.patch(bulk_path) as mock_is_items_available_for_checkout:
         mock_is_item_available_for_checkout.return_value = False
+        mock_is_items_available_for_checkout.side_effect = \
+            lambda item_pids: {
+                (item_pid["type"], item_pid["value"]):
+                    mock_is_item_available_for_checkout.return_value
+                for item_pid in item_pids
+            }
         yield mock_is_item_available_for_checkout
 
 
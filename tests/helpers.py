@@ -21,6 +21,12 @@ from six.moves import reduce
 from invenio_circulation.api import Loan
 from invenio_circulation.permissions import has_read_loan_permission
 from invenio_circulation.pidstore.pids import CIRCULATION_LOAN_MINTER
+from invenio_circulation.proxies import current_circulation
+
+
+def reload_circulation_config():
+    """Bind again the swapped configuration to the transitions."""
+    current_circulation.circulation.reload_config()
 
 
 class SwappedConfig:
@@ -35,10 +41,12 @@ class SwappedConfig:
         """Save previous value and swap it with the new."""
         self.prev_value = current_app.config[self.key]
         current_app.config[self.key] = self.new_value
+        reload_circulation_config()
 
     def __exit__(self, type, value, traceback):
         """Restore previous value."""
         current_app.config[self.key] = self.prev_value
+        reload_circulation_config()
 
 
 class SwappedNestedConfig:
@@ -53,14 +61,20 @@ class SwappedNestedConfig:
         """Save previous value and swap it with the new."""
         config_obj = reduce(dict.__getitem__, self.nested_keys[:-1],
                             current_app.config)
-        self.prev_value = config_obj[self.nested_keys[-1]]
+        self.missing = self.nested_keys[-1] not in config_obj
+        self.prev_value = config_obj.get(self.nested_keys[-1])
         config_obj[self.nested_keys[-1]] = self.new_value
+        reload_circulation_config()
 
     def __exit__(self, type, value, traceback):
         """Restore previous value."""
         config_obj = reduce(dict.__getitem__, self.nested_keys[:-1],
                             current_app.config)
-        config_obj[self.nested_keys[-1]] = self.prev_value
+        if self.missing:
+            del config_obj[self.nested_keys[-1]]
+        else:
+            config_obj[self.nested_keys[-1]] = self.prev_value
+        reload_circulation_config()
 
 
 def create_loan(data):
@@ -8,14 +8,16 @@
 
 """Tests for loan states."""
 
+import mock
 import pytest
 from invenio_indexer.api import RecordIndexer
 from invenio_search import current_search
 
-from invenio_circulation.api import get_loan_for_item
+from invenio_circulation.api import get_available_item_by_doc_pid, \
+    get_loan_for_item, get_loans_for_items, is_items_available_for_checkout
 from invenio_circulation.errors import MultipleLoansOnItemError
 
-from .helpers import create_loan
+from .helpers import SwappedConfig, SwappedNestedConfig, create_loan
 
 
 def test_api_circulation_item_loan_pending(app, indexed_loans):
@@ -83,3 +85,149 @@ def test_multiple_active_loans(app, db, indexed_loans):
 
     with pytest.raises(MultipleLoansOnItemError):
         get_loan_for_item(multiple_loans_pid)
+
+
+def test_api_circulation_items_availability(app, indexed_loans):
+    """Test the availability of many items with a single search."""
+    item_pids = [
+        dict(type="itemid", value="item_pending_1"),
+        dict(type="itemid", value="item_on_loan_2"),
+        dict(type="itemid", value="item_returned_3"),
+        dict(type="itemid", value="item_at_desk_5"),
+        dict(type="itemid", value="item_not_loaned"),
+        dict(type="otherid", value="item_on_loan_2"),
+    ]
+    availability = is_items_available_for_checkout(item_pids)
+    assert availability == {
+        ("itemid", "item_pending_1"): True,
+        ("itemid", "item_on_loan_2"): False,
+        ("itemid", "item_returned_3"): True,
+        ("itemid", "item_at_desk_5"): False,
+        ("itemid", "item_not_loaned"): True,
+        ("otherid", "item_on_loan_2"): True,
+    }
+    assert is_items_available_for_checkout(
+        item_pid for item_pid in item_pids
+    ) == availability
+    assert is_items_available_for_checkout([]) == {}
+
+
+def test_api_circulation_available_item_by_doc_pid(app, indexed_loans):
+    """Test that the first available item of a document is returned."""
+    item_pids = [
+        dict(type="itemid", value="item_on_loan_2"),
+        dict(type="itemid", value="item_at_desk_5"),
+        dict(type="itemid", value="item_returned_3"),
+    ]
+    with SwappedConfig(
+        "CIRCULATION_ITEMS_RETRIEVER_FROM_DOCUMENT", lambda x: item_pids
+    ):
+        assert get_available_item_by_doc_pid("document_pid") == item_pids[2]
+    with SwappedConfig(
+        "CIRCULATION_ITEMS_RETRIEVER_FROM_DOCUMENT", lambda x: item_pids[:2]
+    ):
+        assert get_available_item_by_doc_pid("document_pid") is None
+
+
+def test_api_circulation_items_availability_batch_policy(app, indexed_loans):
+    """Test that the batch item_can_circulate policy is preferred."""
+    calls = []
+
+    def item_can_circulate_many(item_pids):
+        calls.append(item_pids)
+        return [item_pid["value"] != "item_returned_3"
+                for item_pid in item_pids]
+
+    item_pids = [
+        dict(type="itemid", value="item_pending_1"),
+        dict(type="itemid", value="item_on_loan_2"),
+        dict(type="itemid", value="item_returned_3"),
+    ]
+    with SwappedNestedConfig(
+        ["CIRCULATION_POLICIES", "checkout", "item_can_circulate_many"],
+        item_can_circulate_many,
+    ):
+        availability = is_items_available_for_checkout(item_pids)
+
+    assert len(calls) == 1
+    assert availability == {
+        ("itemid", "item_pending_1"): True,
+        ("itemid", "item_on_loan_2"): False,
+        ("itemid", "item_returned_3"): False,
+    }
+
+
+def test_api_circulation_loans_for_items(app, indexed_loans):
+    """Test that the active Loan of each of the given Items is returned."""
+    item_pids = [
+        dict(type="itemid", value="item_pending_1"),
+        dict(type="itemid", value="item_on_loan_2"),
+        dict(type="itemid", value="item_at_desk_5"),
+        dict(type="otherid", value="item_on_loan_2"),
+    ]
+    loans = get_loans_for_items(item_pids)
+    assert loans[("itemid", "item_pending_1")] is None
+    assert loans[("otherid", "item_on_loan_2")] is None
+    assert loans[("itemid", "item_on_loan_2")]["state"] == "ITEM_ON_LOAN"
+    assert loans[("itemid", "item_at_desk_5")]["state"] == "ITEM_AT_DESK"
+    assert get_loans_for_items([]) == {}
+
+    # the items are searched in chunks
+    with mock.patch(
+        "invenio_circulation.api.ITEMS_SEARCH_CHUNK_SIZE", 1
+    ):
+        assert get_loans_for_items(item_pids) == loans
+        assert is_items_available_for_checkout(item_pids[:2]) == {
+            ("itemid", "item_pending_1"): True,
+            ("itemid", "item_on_loan_2"): False,
+        }
+
+
+def test_multiple_active_loans_for_items(app, db, indexed_loans):
+    """Test that raises if there are multiple active Loans for an Item."""
+    test_loan_data = {
+        "item_pid": {
+            "type": "itemid",
+            "value": "item_on_loan_2",
+        },
+        "patron_pid": "2",
+        "state": "ITEM_ON_LOAN",
+        "transaction_date": "2018-06-26T09:00:00.442118+00:00",
+        "transaction_location_pid": "loc_pid",
+        "transaction_user_pid": "user_pid",
+        "start_date": "2018-07-24",
+        "end_date": "2018-08-23",
+    }
+
+    pid, loan = create_loan(test_loan_data)
+    db.session.commit()
+    RecordIndexer().index(loan)
+    current_search.flush_and_refresh(index="loans")
+
+    item_pids = [
+        dict(type="itemid", value="item_on_loan_2"),
+        dict(type="itemid", value="item_at_desk_5"),
+    ]
+    with pytest.raises(MultipleLoansOnItemError):
+        get_loans_for_items(item_pids)
+
+    # the other items are returned when the errors are collected
+    errors = {}
+    loans = get_loans_for_items(item_pids, errors=errors)
+    assert list(errors) == [("itemid", "item_on_loan_2")]
+    assert isinstance(errors[("itemid", "item_on_loan_2")],
+                      MultipleLoansOnItemError)
+    assert loans[("itemid", "item_on_loan_2")] is None
+    assert loans[("itemid", "item_at_desk_5")]["state"] == "ITEM_AT_DESK"
+
+    # the hits of the other items are not left out by the duplicates
+    with mock.patch(
+        "invenio_circulation.api.ITEMS_SEARCH_CHUNK_SIZE", 1
+    ):
+        assert get_loans_for_items(item_pids, errors={}) == loans
+    # a third active loan on the same item
+    pid, loan = create_loan(test_loan_data)
+    db.session.commit()
+    RecordIndexer().index(loan)
+    current_search.flush_and_refresh(index="loans")
+    assert get_loans_for_items(item_pids, errors={}) == loans
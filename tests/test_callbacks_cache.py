@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Tests for the caching of the configured callbacks."""
+
+from invenio_circulation.cache import TTLCache, get_callback, \
+    invalidate_process_cache, invalidate_request_cache
+from invenio_circulation.proxies import current_circulation
+from invenio_circulation.signals import item_changed
+
+from .helpers import SwappedConfig
+
+
+def _counting_callback(calls, result):
+    """Return a callback counting its calls."""
+    def callback(*args):
+        calls.append(args)
+        return result
+    return callback
+
+
+def test_request_cached_callbacks(app):
+    """Test that listed callbacks are memoized during the request."""
+    invalidate_request_cache()
+    calls = []
+    item_pid = dict(type="itemid", value="item_pid")
+    other_item_pid = dict(type="itemid", value="other_item_pid")
+    with SwappedConfig(
+        "CIRCULATION_ITEM_EXISTS", _counting_callback(calls, True)
+    ), SwappedConfig(
+        "CIRCULATION_REQUEST_CACHED_CALLBACKS", ["CIRCULATION_ITEM_EXISTS"]
+    ):
+        assert get_callback("CIRCULATION_ITEM_EXISTS")(item_pid)
+        assert get_callback("CIRCULATION_ITEM_EXISTS")(dict(item_pid))
+        assert get_callback("CIRCULATION_ITEM_EXISTS")(other_item_pid)
+        assert len(calls) == 2
+
+        invalidate_request_cache(item_pids=[item_pid])
+        get_callback("CIRCULATION_ITEM_EXISTS")(item_pid)
+        get_callback("CIRCULATION_ITEM_EXISTS")(other_item_pid)
+        assert len(calls) == 3
+
+        invalidate_request_cache()
+        get_callback("CIRCULATION_ITEM_EXISTS")(other_item_pid)
+        assert len(calls) == 4
+
+
+def test_not_cached_callbacks(app):
+    """Test that callbacks are not memoized by default."""
+    invalidate_request_cache()
+    calls = []
+    with SwappedConfig(
+        "CIRCULATION_PATRON_EXISTS", _counting_callback(calls, True)
+    ):
+        get_callback("CIRCULATION_PATRON_EXISTS")("patron_pid")
+        get_callback("CIRCULATION_PATRON_EXISTS")("patron_pid")
+        assert len(calls) == 2
+
+
+def test_transition_invalidates_cached_callbacks(
+    loan_created, params, mock_is_item_available_for_checkout
+):
+    """Test that a transition invalidates the callbacks of its item."""
+    mock_is_item_available_for_checkout.return_value = True
+    invalidate_request_cache()
+    calls = []
+    with SwappedConfig(
+        "CIRCULATION_ITEM_EXISTS", _counting_callback(calls, True)
+    ), SwappedConfig(
+        "CIRCULATION_REQUEST_CACHED_CALLBACKS", ["CIRCULATION_ITEM_EXISTS"]
+    ):
+        loan = current_circulation.circulation.trigger(
+            loan_created, **dict(params, trigger="checkout")
+        )
+        assert len(calls) == 1
+        get_callback("CIRCULATION_ITEM_EXISTS")(params["item_pid"])
+        assert len(calls) == 2
+
+        # memoized result used by the extension, then invalidated
+        current_circulation.circulation.trigger(
+            loan, **dict(params, trigger="extend")
+        )
+        assert len(calls) == 2
+        get_callback("CIRCULATION_ITEM_EXISTS")(params["item_pid"])
+        assert len(calls) == 3
+
+
+def test_ttl_cache():
+    """Test the LRU cache with expiring entries."""
+    now = [0]
+    cache = TTLCache(maxsize=2, ttl=10, timer=lambda: now[0])
+
+    assert cache.get_or_set("a", lambda: 1) == 1
+    assert cache.get_or_set("a", lambda: 2) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # least recently used entry is evicted
+    cache.get_or_set("b", lambda: 2)
+    cache.get_or_set("a", lambda: 3)
+    cache.get_or_set("c", lambda: 3)
+    assert len(cache) == 2
+    assert cache.get_or_set("b", lambda: 4) == 4
+
+    # expired entries are refreshed
+    now[0] = 11
+    assert cache.get_or_set("b", lambda: 5) == 5
+
+    cache.invalidate(lambda key: key == "b")
+    assert cache.get_or_set("b", lambda: 6) == 6
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_process_cached_callbacks(app):
+    """Test that listed callbacks are memoized in the process."""
+    invalidate_request_cache()
+    invalidate_process_cache()
+    calls = []
+    item_pid = dict(type="itemid", value="item_pid")
+    cache = current_circulation.callbacks_cache
+    hits, misses = cache.hits, cache.misses
+    with SwappedConfig(
+        "CIRCULATION_ITEM_LOCATION_RETRIEVER",
+        _counting_callback(calls, "loc_pid"),
+    ), SwappedConfig(
+        "CIRCULATION_PROCESS_CACHED_CALLBACKS",
+        ["CIRCULATION_ITEM_LOCATION_RETRIEVER"],
+    ):
+        retriever = get_callback("CIRCULATION_ITEM_LOCATION_RETRIEVER")
+        assert retriever(item_pid) == "loc_pid"
+        assert retriever(item_pid) == "loc_pid"
+        assert len(calls) == 1
+        assert (cache.hits - hits, cache.misses - misses) == (1, 1)
+
+        # the host application notifies that the item has moved
+        item_changed.send(None, item_pid=item_pid)
+        assert retriever(item_pid) == "loc_pid"
+        assert len(calls) == 2
+
+        invalidate_process_cache()
+        assert retriever(item_pid) == "loc_pid"
+        assert len(calls) == 3
@@ -13,8 +13,37 @@ import pytest
 from invenio_circulation.errors import NoValidTransitionAvailableError
 from invenio_circulation.proxies import current_circulation
 
+from .helpers import SwappedConfig
+
 
 def test_invalid_transitions(loan_created, app, params):
     """Test that there are no conditional transitions at this state."""
     with pytest.raises(NoValidTransitionAvailableError):
         current_circulation.circulation.trigger(loan_created, **params)
+
+
+def test_transitions_indexed_by_state_and_trigger(app):
+    """Test that transitions are indexed by source state and trigger."""
+    circulation = current_circulation.circulation
+    candidates = circulation.transitions_by_trigger[("ITEM_ON_LOAN", "next")]
+    assert [t.dest for t in candidates] == [
+        "ITEM_RETURNED", "ITEM_IN_TRANSIT_TO_HOUSE"
+    ]
+    candidates = circulation.transitions_by_trigger[("ITEM_ON_LOAN", "extend")]
+    assert [t.dest for t in candidates] == ["ITEM_ON_LOAN"]
+    assert ("CREATED", "next") not in circulation.transitions_by_trigger
+
+
+def test_reload_config(app):
+    """Test that the configuration is bound again to the transitions."""
+    circulation = current_circulation.circulation
+    transition = circulation.transitions_by_trigger[
+        ("ITEM_ON_LOAN", "extend")
+    ][0]
+    policies = app.config["CIRCULATION_POLICIES"]
+    assert transition.policies is policies
+
+    with SwappedConfig("CIRCULATION_POLICIES", dict(policies)):
+        assert transition.policies is app.config["CIRCULATION_POLICIES"]
+        assert transition.policies is not policies
+    assert transition.policies is policies
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Tests for batch of loan actions."""
+
+import json
+
+import mock
+from flask import url_for
+from invenio_db import db
+
+from invenio_circulation.api import Loan
+from invenio_circulation.errors import MissingRequiredParameterError, \
+    MultipleLoansOnItemError
+from invenio_circulation.proxies import current_circulation
+from invenio_circulation.transitions.batch import TransitionsBatch
+
+from .helpers import create_loan
+
+
+def test_trigger_many(
+    app, loan_created, params, mock_ensure_item_is_available_for_checkout
+):
+    """Test that failing loans do not prevent the others to be committed."""
+    _, other_loan = create_loan({})
+    db.session.commit()
+    other_params = dict(params)
+    del other_params["transaction_user_pid"]
+
+    with mock.patch.object(
+        db.session, "commit", wraps=db.session.commit
+    ) as mock_commit:
+        results = current_circulation.circulation.trigger_many(
+            [(loan_created, params), (other_loan, other_params)],
+            trigger="checkout",
+        )
+        assert mock_commit.call_count == 1
+
+    (loan, error), (failed_loan, failed_error) = results
+    assert error is None
+    assert Loan.get_record(loan.id)["state"] == "ITEM_ON_LOAN"
+    assert isinstance(failed_error, MissingRequiredParameterError)
+    assert Loan.get_record(failed_loan.id)["state"] == "CREATED"
+
+
+def test_batch_item_availability(app, params):
+    """Test that an item checked out in the batch is no more available."""
+    item_pid = params["item_pid"]
+    path = "invenio_circulation.transitions.batch" \
+        ".is_items_available_for_checkout"
+    with mock.patch(path) as mock_is_items_available_for_checkout:
+        mock_is_items_available_for_checkout.return_value = {
+            (item_pid["type"], item_pid["value"]): True
+        }
+        with TransitionsBatch(item_pids=[item_pid]) as batch:
+            assert batch.is_item_available_for_checkout(item_pid)
+            loan = Loan({"state": "ITEM_ON_LOAN", "item_pid": item_pid})
+            batch.add(mock.Mock(), Loan({}), loan, [])
+            assert not batch.is_item_available_for_checkout(item_pid)
+            batch.completed = []
+        mock_is_items_available_for_checkout.assert_called_once_with(
+            [item_pid]
+        )
+
+
+def test_rest_batch_actions(
+    app, json_headers, params, loan_created,
+    mock_ensure_item_is_available_for_checkout
+):
+    """Test API action on many loans."""
+    _, invalid_loan = create_loan({})
+    db.session.commit()
+    invalid_params = dict(params, pid=invalid_loan["pid"])
+    del invalid_params["transaction_user_pid"]
+    data = [
+        dict(params, pid=loan_created["pid"]),
+        dict(params, pid="not-existing"),
+        invalid_params,
+    ]
+    url = url_for(
+        "invenio_circulation_loan_actions.loanid_batch_actions",
+        action="checkout",
+    )
+    with app.test_client() as client:
+        res = client.post(url, headers=json_headers, data=json.dumps(data))
+        payload = json.loads(res.data.decode("utf-8"))
+
+    assert res.status_code == 207
+    success, not_found, invalid = payload["hits"]
+    assert success["status"] == 200
+    assert success["metadata"]["state"] == "ITEM_ON_LOAN"
+    assert not_found["pid"] == "not-existing"
+    assert not_found["status"] == 404
+    # the invalid parameters do not prevent the other loans to be committed
+    assert invalid["pid"] == invalid_loan["pid"]
+    assert invalid["status"] == 400
+    assert invalid["errors"][0]["field"] == "transaction_user_pid"
+    assert Loan.get_record(invalid_loan.id)["state"] == "CREATED"
+
+    with app.test_client() as client:
+        res = client.post(
+            url, headers=json_headers, data=json.dumps([
+                dict(params, pid=invalid_loan["pid"]),
+            ])
+        )
+        payload = json.loads(res.data.decode("utf-8"))
+    assert res.status_code == 200
+    assert payload["hits"][0]["status"] == 200
+
+
+def test_checkin_many_items_of_same_document(
+    app, loan_created, params, mock_ensure_item_is_available_for_checkout
+):
+    """Test that pending requests are assigned once per document."""
+    _, other_loan = create_loan({})
+    db.session.commit()
+    other_params = dict(
+        params, item_pid=dict(type="itemid", value="other_item_pid")
+    )
+    circulation = current_circulation.circulation
+    loans = [
+        circulation.trigger(loan_created, **dict(params, trigger="checkout")),
+        circulation.trigger(
+            other_loan, **dict(other_params, trigger="checkout")
+        ),
+    ]
+    assert all(loan["state"] == "ITEM_ON_LOAN" for loan in loans)
+
+    pending_loan = Loan.create({"pid": "pending_1", "state": "PENDING"})
+    db.session.commit()
+
+    get_locations = mock.Mock(return_value=["loc_pid", "loc_pid"])
+    app.config["CIRCULATION_ITEMS_LOCATION_RETRIEVER"] = get_locations
+    path = "invenio_circulation.transitions.batch" \
+        ".get_pending_loans_by_doc_pid"
+    try:
+        with mock.patch(path) as mock_get_pending_loans_by_doc_pid, \
+                mock.patch.object(
+                    db.session, "commit", wraps=db.session.commit
+                ) as mock_commit:
+            mock_get_pending_loans_by_doc_pid.return_value = [pending_loan]
+            results = circulation.trigger_many(
+                list(zip(loans, [params, other_params]))
+            )
+            assert mock_commit.call_count == 1
+            mock_get_pending_loans_by_doc_pid.assert_called_once_with(
+                "document_pid"
+            )
+        get_locations.assert_called_once_with(
+            [params["item_pid"], other_params["item_pid"]]
+        )
+    finally:
+        app.config["CIRCULATION_ITEMS_LOCATION_RETRIEVER"] = None
+
+    assert [error for _, error in results] == [None, None]
+    assert all(loan["state"] == "ITEM_RETURNED" for loan, _ in results)
+    # the last returned item is assigned to the pending request
+    assert pending_loan["item_pid"] == other_params["item_pid"]
+
+
+def test_rest_checkin(
+    app, json_headers, params, loan_created,
+    mock_ensure_item_is_available_for_checkout
+):
+    """Test API checkin of many items."""
+    loan = current_circulation.circulation.trigger(
+        loan_created, **dict(params, trigger="checkout")
+    )
+    assert loan["state"] == "ITEM_ON_LOAN"
+
+    data = [
+        dict(
+            item_pid=params["item_pid"],
+            transaction_user_pid="user_pid",
+            transaction_location_pid="loc_pid",
+        ),
+        dict(
+            item_pid=dict(type="itemid", value="not_on_loan"),
+            transaction_user_pid="user_pid",
+            transaction_location_pid="loc_pid",
+        ),
+        dict(
+            item_pid={},
+            transaction_user_pid="user_pid",
+            transaction_location_pid="loc_pid",
+        ),
+        dict(
+            item_pid=dict(type="itemid", value=1),
+            transaction_user_pid="user_pid",
+            transaction_location_pid="loc_pid",
+        ),
+        dict(
+            item_pid=dict(type="itemid", value="multiple_loans"),
+            transaction_user_pid="user_pid",
+            transaction_location_pid="loc_pid",
+        ),
+    ]
+
+    def get_loans_for_items(item_pids, errors=None):
+        key = ("itemid", "multiple_loans")
+        errors[key] = MultipleLoansOnItemError(
+            item_pid=dict(type=key[0], value=key[1])
+        )
+        return {("itemid", "item_pid"): loan}
+
+    path = "invenio_circulation.records.loaders.get_loans_for_items"
+    with mock.patch(path) as mock_get_loans_for_items, \
+            app.test_client() as client:
+        mock_get_loans_for_items.side_effect = get_loans_for_items
+        url = url_for("invenio_circulation_loan_actions.loanid_checkin")
+        res = client.post(url, headers=json_headers, data=json.dumps(data))
+        payload = json.loads(res.data.decode("utf-8"))
+
+    assert res.status_code == 207
+    returned, not_on_loan, no_item_pid, invalid_item_pid, multiple_loans = \
+        payload["hits"]
+    assert returned["status"] == 200
+    assert returned["metadata"]["state"] in [
+        "ITEM_RETURNED", "ITEM_IN_TRANSIT_TO_HOUSE"
+    ]
+    assert not_on_loan["status"] == 404
+    assert no_item_pid["status"] == 400
+    assert no_item_pid["item_pid"] == {}
+    assert invalid_item_pid["status"] == 400
+    assert invalid_item_pid["error_class"] == "MissingRequiredParameterError"
+    # an item with multiple active loans does not abort the checkin
+    assert multiple_loans["status"] == 400
+    assert multiple_loans["error_class"] == "MultipleLoansOnItemError"
+    # only the valid item PIDs are searched
+    mock_get_loans_for_items.assert_called_once_with(
+        [
+            params["item_pid"],
+            dict(type="itemid", value="not_on_loan"),
+            dict(type="itemid", value="multiple_loans"),
+        ],
+        errors={},
+    )
+
+
+def test_rest_checkin_loan_at_desk(app, json_headers, params):
+    """Test that a loan at desk is not checked out by a checkin."""
+    loan = Loan.create(dict(
+        params, pid="at_desk_1", state="ITEM_AT_DESK",
+        pickup_location_pid="loc_pid",
+        transaction_date="2020-01-01T10:00:00+00:00",
+    ))
+    db.session.commit()
+
+    data = [dict(
+        item_pid=params["item_pid"],
+        transaction_user_pid="user_pid",
+        transaction_location_pid="loc_pid",
+    )]
+    path = "invenio_circulation.records.loaders.get_loans_for_items"
+    with mock.patch(path) as mock_get_loans_for_items, \
+            app.test_client() as client:
+        mock_get_loans_for_items.return_value = {
+            ("itemid", "item_pid"): loan
+        }
+        url = url_for("invenio_circulation_loan_actions.loanid_checkin")
+        res = client.post(url, headers=json_headers, data=json.dumps(data))
+        payload = json.loads(res.data.decode("utf-8"))
+
+    assert res.status_code == 207
+    hit = payload["hits"][0]
+    assert hit["pid"] == "at_desk_1"
+    assert hit["status"] == 400
+    assert hit["error_class"] == "InvalidLoanStateError"
+    assert Loan.get_record(loan.id)["state"] == "ITEM_AT_DESK"
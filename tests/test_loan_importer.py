@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Tests for loans bulk import."""
+
+import json
+
+import mock
+import pytest
+from invenio_records.models import RecordMetadata
+
+from invenio_circulation.api import Loan
+from invenio_circulation.cli import import_loans_command
+from invenio_circulation.errors import InvalidLoanImportError
+from invenio_circulation.importer import import_loans
+from invenio_circulation.pidstore.providers import CirculationLoanIdProvider
+
+
+def _loan_data(item_value):
+    """Return the data of a loan to import."""
+    return dict(
+        state="ITEM_RETURNED",
+        patron_pid="patron_pid",
+        item_pid=dict(type="itemid", value=item_value),
+        transaction_location_pid="loc_pid",
+        transaction_user_pid="user_pid",
+        transaction_date="2018-01-01T00:00:00+00:00",
+        start_date="2018-01-01",
+        end_date="2018-01-15",
+    )
+
+
+def test_reserve_loan_pids(app, db):
+    """Test that a range of PIDs is reserved."""
+    pids = CirculationLoanIdProvider.reserve(3)
+    assert len(pids) == 3
+    assert [int(pid) for pid in pids] == list(
+        range(int(pids[0]), int(pids[0]) + 3)
+    )
+    assert CirculationLoanIdProvider.reserve(1) == [str(int(pids[-1]) + 1)]
+    assert CirculationLoanIdProvider.reserve(0) == []
+
+
+def test_import_loans(app, db):
+    """Test the import of loans in chunks."""
+    loans_data = (_loan_data("item_{}".format(i)) for i in range(5))
+    with mock.patch(
+        "invenio_circulation.importer.current_circulation"
+    ) as mock_circulation:
+        count = import_loans(loans_data, chunk_size=2)
+        indexer = mock_circulation.loan_indexer.return_value
+        assert indexer.bulk_index.call_count == 3
+        indexer.process_bulk_queue.assert_called_once_with()
+    assert count == 5
+
+    pids = [
+        record_id
+        for call in indexer.bulk_index.call_args_list
+        for record_id in call[0][0]
+    ]
+    loans = [Loan.get_record(record_id) for record_id in pids]
+    assert [loan["item_pid"]["value"] for loan in loans] == [
+        "item_{}".format(i) for i in range(5)
+    ]
+    for loan in loans:
+        assert loan["state"] == "ITEM_RETURNED"
+        assert loan["document_pid"] == "document_pid"
+        assert Loan.get_record_by_pid(loan["pid"]).id == loan.id
+
+
+def test_import_invalid_loan(app, db):
+    """Test that an invalid loan aborts the import."""
+    invalid = dict(_loan_data("item_pid"), start_date=1)
+    with pytest.raises(InvalidLoanImportError) as excinfo:
+        import_loans(
+            [_loan_data("item_1"), _loan_data("item_2"), invalid],
+            chunk_size=2, index=False,
+        )
+    assert "Loan #3" in excinfo.value.description
+    # the previous chunks are committed
+    assert RecordMetadata.query.count() == 2
+
+
+def test_import_invalid_loan_cli(app, db, tmpdir):
+    """Test that the import loans command reports an invalid loan."""
+    source = tmpdir.join("loans.jsonl")
+    source.write(json.dumps(dict(_loan_data("item_pid"), start_date=1)))
+    runner = app.test_cli_runner()
+    result = runner.invoke(
+        import_loans_command, [str(source), "--no-index"]
+    )
+    assert result.exit_code == 2
+    assert "Loan #1 cannot be imported" in result.output
+
+
+def test_import_loan_with_pid(app, db):
+    """Test that a loan with a PID aborts the import."""
+    loans_data = [_loan_data("item_1"), dict(_loan_data("item_2"), pid="1")]
+    with pytest.raises(InvalidLoanImportError) as excinfo:
+        import_loans(loans_data, chunk_size=1, index=False)
+    assert "Loan #2" in excinfo.value.description
+
+
+def test_import_loans_cli(app, db, tmpdir):
+    """Test the import loans command."""
+    source = tmpdir.join("loans.jsonl")
+    source.write("\n".join(
+        json.dumps(_loan_data("item_{}".format(i))) for i in range(3)
+    ))
+    runner = app.test_cli_runner()
+    result = runner.invoke(
+        import_loans_command, [str(source), "--no-index"]
+    )
+    assert result.exit_code == 0
+    assert "3 loans imported." in result.output
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Tests for loan indexing modes."""
+
+import mock
+
+from invenio_circulation.ext import InvenioCirculation
+from invenio_circulation.indexer import flush_loans_index, index_loans
+from invenio_circulation.proxies import current_circulation
+
+from .helpers import SwappedConfig
+
+
+def _checkout(loan, params):
+    """Checkout the given loan."""
+    return current_circulation.circulation.trigger(
+        loan, **dict(params, trigger="checkout")
+    )
+
+
+def test_sync_loan_indexing(
+    loan_created, params, mock_is_item_available_for_checkout
+):
+    """Test that loans are indexed right after the transition."""
+    mock_is_item_available_for_checkout.return_value = True
+    indexer = mock.Mock()
+    with mock.patch.object(
+        InvenioCirculation, "loan_indexer", mock.Mock(return_value=indexer)
+    ):
+        loan = _checkout(loan_created, params)
+        indexer.index.assert_called_once_with(loan)
+        flush_loans_index()
+        assert not indexer.bulk_index.called
+
+        # the bulk indexing queue is not used
+        index_loans([loan, loan_created])
+        indexer.index.assert_called_with(loan_created)
+        assert indexer.index.call_count == 3
+        assert not indexer.bulk_index.called
+        assert not indexer.process_bulk_queue.called
+
+
+def test_bulk_loan_indexing(
+    loan_created, params, mock_is_item_available_for_checkout
+):
+    """Test that loans are bulk indexed when the app context ends."""
+    mock_is_item_available_for_checkout.return_value = True
+    indexer = mock.Mock()
+    with mock.patch.object(
+        InvenioCirculation, "loan_indexer", mock.Mock(return_value=indexer)
+    ), mock.patch(
+        "invenio_circulation.indexer.bulk"
+    ) as mock_bulk, SwappedConfig("CIRCULATION_LOAN_INDEXING_MODE", "bulk"):
+        mock_bulk.side_effect = lambda client, actions, **kwargs: len(
+            list(actions)
+        )
+        loan = _checkout(loan_created, params)
+        loan = current_circulation.circulation.trigger(
+            loan, **dict(params, trigger="extend")
+        )
+        assert not indexer.index.called
+
+        flush_loans_index()
+        assert mock_bulk.call_count == 1
+        indexer._index_action.assert_called_once_with(
+            dict(id=str(loan.id), op="index")
+        )
+        # the shared bulk indexing queue is not used
+        assert not indexer.bulk_index.called
+        assert not indexer.process_bulk_queue.called
+
+        # nothing left to index
+        flush_loans_index()
+        assert mock_bulk.call_count == 1
+
+
+def test_queue_loan_indexing(
+    loan_created, params, mock_is_item_available_for_checkout
+):
+    """Test that loans are sent to the bulk indexing queue."""
+    mock_is_item_available_for_checkout.return_value = True
+    indexer = mock.Mock()
+    with mock.patch.object(
+        InvenioCirculation, "loan_indexer", mock.Mock(return_value=indexer)
+    ), SwappedConfig("CIRCULATION_LOAN_INDEXING_MODE", "queue"):
+        loan = _checkout(loan_created, params)
+        flush_loans_index()
+        indexer.bulk_index.assert_called_once_with({str(loan.id)})
+        assert not indexer.process_bulk_queue.called
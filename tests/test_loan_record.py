@@ -9,8 +9,18 @@
 """Tests for loan JSON schema."""
 
 from copy import deepcopy
+from datetime import timedelta
 
+import arrow
+import mock
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from invenio_circulation.api import Loan
 from invenio_circulation.proxies import current_circulation
+from invenio_circulation.utils import str2datetime
+
+from .helpers import SwappedConfig
 
 
 def test_state_checkout_with_loan_pid(
@@ -26,3 +36,84 @@ def test_state_checkout_with_loan_pid(
 def test_indexed_loans(indexed_loans):
     """Test mappings, index creation and loans indexing."""
     assert indexed_loans
+
+
+def test_get_records_by_pids(test_loans):
+    """Test retrieve many loans by pid, preserving the order."""
+    pids = [pid.pid_value for pid, _ in test_loans]
+    requested = list(reversed(pids[:3])) + ["not_existing"] + pids[3:5]
+    loans, missing_pids = Loan.get_records_by_pids(requested)
+    assert [loan["pid"] for loan in loans] == \
+        [pid for pid in requested if pid != "not_existing"]
+    assert missing_pids == ["not_existing"]
+    for loan in loans:
+        assert isinstance(loan, Loan)
+        assert loan.id == Loan.get_record_by_pid(loan["pid"]).id
+
+    assert Loan.get_records_by_pids([]) == ([], [])
+
+
+def test_cached_validator(app, loan_created, db, params):
+    """Test that loans are validated with a validator built once."""
+    circulation = current_circulation._get_current_object()
+    with SwappedConfig("CIRCULATION_LOAN_CACHED_VALIDATOR", True):
+        validator = circulation.get_validator(loan_created["$schema"])
+        records_state = app.extensions["invenio-records"]
+        with mock.patch.object(
+            records_state, "validate"
+        ) as mock_records_validate, mock.patch.object(
+            circulation, "get_validator", wraps=circulation.get_validator,
+        ) as mock_get_validator:
+            loan_created["patron_pid"] = "patron_pid"
+            loan_created.commit()
+            assert not mock_records_validate.called
+            # the cached validator is used when committing
+            mock_get_validator.assert_called_once_with(
+                loan_created["$schema"]
+            )
+
+        loan_created["start_date"] = 1
+        with pytest.raises(ValidationError):
+            loan_created.commit()
+    assert current_circulation.get_validator(
+        loan_created["$schema"]
+    ) is validator
+
+
+def test_date_fields_restored(app):
+    """Test that the unchanged date fields are restored to their value."""
+    loan = Loan(dict(
+        start_date="2020-01-01",
+        end_date="2020-01-31",
+        transaction_date="2020-01-01T10:00:00Z",
+    ))
+    converted = loan.date_fields2datetime()
+    assert isinstance(loan["start_date"], arrow.Arrow)
+
+    loan["end_date"] = loan["end_date"] + timedelta(days=1)
+    loan.date_fields2str(converted)
+    assert loan["start_date"] == "2020-01-01"
+    assert loan["end_date"] == "2020-02-01"
+    assert loan["transaction_date"] == "2020-01-01T10:00:00Z"
+
+
+def test_date_accessors(loan_created, db):
+    """Test that date fields are parsed lazily, once, and serialized."""
+    loan_created["start_date"] = "2020-01-01"
+    assert loan_created.end_date is None
+
+    path = "invenio_circulation.api.str2datetime"
+    with mock.patch(path, wraps=str2datetime) as mock_str2datetime:
+        assert loan_created.start_date == arrow.get("2020-01-01")
+        assert loan_created.start_date is loan_created.start_date
+        assert mock_str2datetime.call_count == 1
+
+        loan_created["start_date"] = "2020-01-02"
+        assert loan_created.start_date == arrow.get("2020-01-02")
+        assert mock_str2datetime.call_count == 2
+
+    loan_created.end_date = loan_created.start_date + timedelta(days=30)
+    assert isinstance(loan_created["end_date"], arrow.Arrow)
+    loan_created.commit()
+    assert loan_created["start_date"] == "2020-01-02"
+    assert loan_created["end_date"] == "2020-02-01"
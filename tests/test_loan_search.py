@@ -8,11 +8,17 @@
 
 """Tests for loan search class."""
 
+import json
+
 from elasticsearch import VERSION as ES_VERSION
 
-from invenio_circulation.api import Loan
-from invenio_circulation.search.api import search_by_patron_item_or_document, \
-    search_by_patron_pid, search_by_pid
+from invenio_circulation.api import Loan, get_next_pending_loan, \
+    get_overdue_loans, get_pending_loans_by_doc_pid, \
+    get_pending_loans_by_item_pid, get_request_queue, \
+    get_request_queue_position, is_item_available_for_checkout
+from invenio_circulation.cli import overdue_loans_command
+from invenio_circulation.search.api import loans_exist, \
+    search_by_patron_item_or_document, search_by_patron_pid, search_by_pid
 
 
 def _assert_total(total, expected):
@@ -150,3 +156,110 @@ def test_search_loans_by_patron_and_item_or_document_filtering_states(
     )
     search_result = search.execute()
     _assert_total(search_result.hits.total, 3)
+
+
+def test_get_pending_loans(indexed_loans):
+    """Test retrieve pending loans by item and by document."""
+    item_pid = dict(type="itemid", value="item_multiple_pending_on_loan_7")
+    loans = list(get_pending_loans_by_item_pid(item_pid))
+    assert len(loans) == 2
+    for loan in loans:
+        assert isinstance(loan, Loan)
+        assert loan["state"] == "PENDING"
+        assert loan["item_pid"] == item_pid
+
+    search = search_by_pid(
+        document_pid="document_pid", filter_states=["PENDING"]
+    )
+    expected_pids = sorted(hit["pid"] for hit in search.scan())
+    loans = list(get_pending_loans_by_doc_pid("document_pid"))
+    assert sorted(loan["pid"] for loan in loans) == expected_pids
+    assert all(loan.id for loan in loans)
+
+
+def test_loans_exist(indexed_loans):
+    """Test checking if a search matches any loan."""
+    search = search_by_pid(
+        item_pid=dict(type="itemid", value="item_multiple_pending_on_loan_7"),
+        filter_states=["PENDING"],
+    )
+    assert loans_exist(search)
+
+    search = search_by_pid(
+        item_pid=dict(type="itemid", value="item_multiple_pending_on_loan_7"),
+        filter_states=["ITEM_RETURNED"],
+    )
+    assert not loans_exist(search)
+
+
+def test_is_item_available_for_checkout(indexed_loans):
+    """Test item availability for checkout."""
+    assert is_item_available_for_checkout(
+        dict(type="itemid", value="item_pending_1")
+    )
+    assert is_item_available_for_checkout(
+        dict(type="itemid", value="item_returned_3")
+    )
+    assert not is_item_available_for_checkout(
+        dict(type="itemid", value="item_on_loan_2")
+    )
+    assert not is_item_available_for_checkout(
+        dict(type="itemid", value="item_in_transit_4")
+    )
+
+
+def test_get_overdue_loans(indexed_loans):
+    """Test retrieve the overdue loans in batches."""
+    batches = list(get_overdue_loans(as_of="2018-09-01", batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 1]
+    for loan in batches[0] + batches[1]:
+        assert isinstance(loan, Loan)
+        assert loan["state"] == "ITEM_ON_LOAN"
+        assert loan["end_date"] == "2018-08-23"
+
+    assert list(get_overdue_loans(as_of="2018-08-23")) == []
+
+
+def test_get_overdue_loans_slices(indexed_loans):
+    """Test retrieve the overdue loans fields, slice by slice."""
+    pids = []
+    for slice_id in range(2):
+        for batch in get_overdue_loans(
+            as_of="2018-09-01",
+            fields=["pid", "end_date"],
+            slice_id=slice_id,
+            max_slices=2,
+        ):
+            for loan in batch:
+                assert set(loan.keys()) == {"pid", "end_date"}
+                pids.append(loan["pid"])
+    assert len(pids) == len(set(pids)) == 3
+
+
+def test_overdue_loans_cli(app, indexed_loans):
+    """Test the overdue loans command."""
+    runner = app.test_cli_runner()
+    result = runner.invoke(
+        overdue_loans_command, ["--as-of", "2018-09-01", "--field", "pid"]
+    )
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert len(lines) == 3
+    assert all(list(json.loads(line).keys()) == ["pid"] for line in lines)
+
+
+def test_request_queue(indexed_loans):
+    """Test the request queue of a document."""
+    queue = list(get_request_queue("document_pid"))
+    assert [loan["patron_pid"] for loan in queue] == ["1", "1", "3", "1"]
+    dates = [loan["transaction_date"] for loan in queue]
+    assert dates == sorted(dates)
+    assert queue[0]["pid"] < queue[1]["pid"]
+
+    assert get_request_queue_position("document_pid", "1") == 1
+    assert get_request_queue_position("document_pid", "3") == 3
+    assert get_request_queue_position("document_pid", "2") is None
+    assert get_request_queue_position("other_document_pid", "1") is None
+
+    assert get_next_pending_loan("document_pid").id == queue[0].id
+    assert get_next_pending_loan("other_document_pid") is None
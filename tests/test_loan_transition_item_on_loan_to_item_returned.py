@@ -8,6 +8,9 @@
 
 """Tests for loan states."""
 
+import mock
+
+from invenio_circulation.api import Loan
 from invenio_circulation.proxies import current_circulation
 
 from .helpers import SwappedConfig
@@ -64,3 +67,44 @@ def test_item_on_loan_to_item_returned_same_location(
             loan, **dict(params)
         )
         assert loan["state"] == "ITEM_RETURNED"
+
+
+def test_item_returned_with_pending_requests_single_commit(
+    loan_created,
+    db,
+    params,
+    mock_is_item_available_for_checkout,
+    mock_get_pending_loans_by_doc_pid,
+):
+    """Test that checkin and pending requests are committed together."""
+    mock_is_item_available_for_checkout.return_value = True
+    loan = current_circulation.circulation.trigger(
+        loan_created,
+        **dict(
+            params,
+            trigger="checkout",
+            pickup_location_pid="loc_pid",
+        )
+    )
+    assert loan["state"] == "ITEM_ON_LOAN"
+
+    pending_loans = [
+        Loan.create({"pid": "pending_1", "state": "PENDING"}),
+        Loan.create({"pid": "pending_2", "state": "PENDING"}),
+    ]
+    db.session.commit()
+    mock_get_pending_loans_by_doc_pid.return_value = pending_loans
+
+    with SwappedConfig(
+        "CIRCULATION_ITEM_LOCATION_RETRIEVER", lambda x: "loc_pid"
+    ), mock.patch.object(
+        db.session, "commit", wraps=db.session.commit
+    ) as mock_commit:
+        loan = current_circulation.circulation.trigger(
+            loan, **dict(params)
+        )
+        assert loan["state"] == "ITEM_RETURNED"
+        assert mock_commit.call_count == 1
+
+    for pending_loan in pending_loans:
+        assert pending_loan["item_pid"] == params["item_pid"]
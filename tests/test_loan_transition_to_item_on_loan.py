@@ -11,13 +11,20 @@
 from datetime import timedelta
 
 import arrow
+import mock
 import pytest
+from invenio_db import db
 
+from invenio_circulation.api import Loan, get_documents_loans_counts, \
+    get_loan_for_item, is_item_available_for_checkout, update_active_loan, \
+    update_document_loans_counts
 from invenio_circulation.errors import ItemNotAvailableError, \
     TransitionConstraintsViolationError
+from invenio_circulation.models import ActiveLoan, ItemLock
 from invenio_circulation.proxies import current_circulation
+from invenio_circulation.transitions.batch import TransitionsBatch
 
-from .helpers import SwappedConfig
+from .helpers import SwappedConfig, create_loan
 
 
 def test_created_to_item_on_loan_available_item_with_default_location(
@@ -161,3 +168,160 @@ def test_pending_to_item_on_loan_available_item(
         assert loan["state"] == "ITEM_ON_LOAN"
         assert loan["pickup_location_pid"] == "other_location_pid"
         assert loan["item_pid"] == dict(type="itemid", value="item_pid")
+
+
+def test_checkout_locking(loan_created, params):
+    """Test that an item checked out is locked until its loan ends."""
+    _, other_loan = create_loan({})
+    db.session.commit()
+
+    path = "invenio_circulation.transitions.base" \
+        ".is_item_available_for_checkout"
+    circulation = current_circulation.circulation
+    # the search index is never refreshed, the item is always available
+    with SwappedConfig("CIRCULATION_CHECKOUT_LOCKING", True), \
+            mock.patch(path, return_value=True), \
+            SwappedConfig(
+                "CIRCULATION_ITEM_LOCATION_RETRIEVER", lambda x: "loc_pid"
+            ):
+        loan = circulation.trigger(
+            loan_created, **dict(params, trigger="checkout")
+        )
+        assert loan["state"] == "ITEM_ON_LOAN"
+        lock = ItemLock.query.get(("itemid", "item_pid"))
+        assert lock.loan_id == loan.id
+
+        with pytest.raises(ItemNotAvailableError):
+            circulation.trigger(
+                other_loan, **dict(params, trigger="checkout")
+            )
+        db.session.rollback()
+
+        loan = circulation.trigger(Loan.get_record(loan.id), **params)
+        assert loan["state"] == "ITEM_RETURNED"
+
+        other_loan = circulation.trigger(
+            Loan.get_record(other_loan.id), **dict(params, trigger="checkout")
+        )
+        assert other_loan["state"] == "ITEM_ON_LOAN"
+        assert ItemLock.query.get(("itemid", "item_pid")).loan_id == \
+            other_loan.id
+
+
+def test_checkout_active_loans_table(loan_created, params):
+    """Test that the active loan of an item is read from the database."""
+    _, other_loan = create_loan({})
+    db.session.commit()
+
+    item_pid = {"type": "itemid", "value": "item_pid"}
+    circulation = current_circulation.circulation
+    # the search index is never refreshed: the table is the only source
+    with SwappedConfig("CIRCULATION_ACTIVE_LOANS_TABLE", True), \
+            SwappedConfig(
+                "CIRCULATION_ITEM_LOCATION_RETRIEVER", lambda x: "loc_pid"
+            ):
+        assert is_item_available_for_checkout(item_pid)
+        loan = circulation.trigger(
+            loan_created, **dict(params, trigger="checkout")
+        )
+        assert loan["state"] == "ITEM_ON_LOAN"
+        assert ActiveLoan.get_by_item_pid(item_pid).loan_id == loan.id
+        assert not is_item_available_for_checkout(item_pid)
+        assert get_loan_for_item(item_pid).id == loan.id
+
+        with pytest.raises(ItemNotAvailableError):
+            circulation.trigger(
+                other_loan, **dict(params, trigger="checkout")
+            )
+        db.session.rollback()
+
+        loan = circulation.trigger(Loan.get_record(loan.id), **params)
+        assert loan["state"] == "ITEM_RETURNED"
+        assert ActiveLoan.get_by_item_pid(item_pid) is None
+        assert get_loan_for_item(item_pid) is None
+
+        other_loan = circulation.trigger(
+            Loan.get_record(other_loan.id), **dict(params, trigger="checkout")
+        )
+        assert ActiveLoan.get_by_item_pid(item_pid).loan_id == other_loan.id
+
+
+def test_concurrent_checkout_active_loans_table(loan_created, params):
+    """Test that an item checked out concurrently is not available."""
+    _, other_loan = create_loan({})
+    item_pid = params["item_pid"]
+    db.session.add(ActiveLoan(
+        item_pid_type=item_pid["type"],
+        item_pid_value=item_pid["value"],
+        loan_id=other_loan.id,
+    ))
+    db.session.commit()
+
+    loan_created["state"] = "ITEM_ON_LOAN"
+    loan_created["item_pid"] = item_pid
+    # the item was available when checked, before the concurrent checkout
+    with mock.patch.object(ActiveLoan, "get_by_item_pid", return_value=None):
+        with pytest.raises(ItemNotAvailableError):
+            update_active_loan({}, loan_created)
+    assert ActiveLoan.get_by_item_pid(item_pid).loan_id == other_loan.id
+
+
+def test_checkout_document_loans_counts(loan_created, params):
+    """Test that the loans counts of the document are maintained."""
+    # the counts are not maintained
+    assert get_documents_loans_counts(["document_pid"]) is None
+
+    circulation = current_circulation.circulation
+    with SwappedConfig("CIRCULATION_DOCUMENT_LOANS_COUNTS", True), \
+            mock.patch(
+                "invenio_circulation.transitions.base"
+                ".is_item_available_for_checkout",
+                return_value=True,
+            ), \
+            SwappedConfig(
+                "CIRCULATION_ITEM_LOCATION_RETRIEVER", lambda x: "loc_pid"
+            ):
+        update_document_loans_counts(
+            {}, {"document_pid": "document_pid", "state": "PENDING"}
+        )
+        loan = circulation.trigger(
+            loan_created, **dict(params, trigger="checkout")
+        )
+        assert get_documents_loans_counts(["document_pid", "other"]) == {
+            "document_pid": dict(active_loans=1, pending_requests=1),
+            "other": dict(active_loans=0, pending_requests=0),
+        }
+
+        circulation.trigger(loan, **params)
+        assert get_documents_loans_counts(["document_pid"]) == {
+            "document_pid": dict(active_loans=0, pending_requests=1),
+        }
+
+
+def test_checkout_at_desk_active_loans_table(loan_created, params):
+    """Test that the loan at desk of an item can be checked out."""
+    item_pid = params["item_pid"]
+    circulation = current_circulation.circulation
+    with SwappedConfig("CIRCULATION_ACTIVE_LOANS_TABLE", True), \
+            SwappedConfig(
+                "CIRCULATION_ITEM_LOCATION_RETRIEVER", lambda x: "loc_pid"
+            ):
+        loan = circulation.trigger(
+            loan_created,
+            **dict(params, trigger="request", pickup_location_pid="loc_pid")
+        )
+        assert loan["state"] == "PENDING"
+        assert ActiveLoan.get_by_item_pid(item_pid) is None
+
+        loan = circulation.trigger(loan, **params)
+        assert loan["state"] == "ITEM_AT_DESK"
+        assert ActiveLoan.get_by_item_pid(item_pid).loan_id == loan.id
+        assert not is_item_available_for_checkout(item_pid)
+        assert is_item_available_for_checkout(item_pid, loan_id=loan.id)
+        batch = TransitionsBatch(item_pids=[item_pid])
+        assert not batch.is_item_available_for_checkout(item_pid)
+        assert batch.is_item_available_for_checkout(item_pid, loan_id=loan.id)
+
+        loan = circulation.trigger(loan, **params)
+        assert loan["state"] == "ITEM_ON_LOAN"
+        assert ActiveLoan.get_by_item_pid(item_pid).loan_id == loan.id
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Tests for asynchronous loan actions, run eagerly by Celery."""
+
+import json
+
+import mock
+from flask import url_for
+from invenio_records_rest.utils import deny_all
+
+from invenio_circulation.api import Loan
+from invenio_circulation.errors import ItemNotAvailableError
+from invenio_circulation.models import LoanActionTask
+from invenio_circulation.proxies import current_circulation
+from invenio_circulation.tasks import trigger_loan_action
+
+from .helpers import SwappedConfig, SwappedNestedConfig
+
+
+def _post(client, json_headers, params, pid_value, action, key):
+    """Perform API POST of the given action with an idempotency key."""
+    url = url_for("invenio_circulation_loan_actions.loanid_actions",
+                  pid_value=pid_value, action=action)
+    headers = json_headers + [("Idempotency-Key", key)]
+    res = client.post(url, headers=headers, data=json.dumps(params))
+    return res, json.loads(res.data.decode("utf-8"))
+
+
+def test_rest_async_loan_action(app, json_headers, params, loan_created):
+    """Test that an asynchronous action is executed once per key."""
+    loan_pid = loan_created["pid"]
+    with SwappedConfig("CIRCULATION_LOAN_ACTIONS_ASYNC", ["checkout"]), \
+            app.test_client() as client:
+        res, payload = _post(
+            client, json_headers, params, loan_pid, "checkout", "key-1"
+        )
+        assert res.status_code == 202
+        assert payload["idempotency_key"] == "key-1"
+        assert payload["id"] == LoanActionTask.build_id("key-1")
+        assert res.headers["Location"] == payload["links"]["self"]
+
+        res = client.get(payload["links"]["self"], headers=json_headers)
+        payload = json.loads(res.data.decode("utf-8"))
+        assert res.status_code == 200
+        assert payload["status"] == "SUCCESS"
+        assert payload["error"] is None
+        assert Loan.get_record(loan_created.id)["state"] == "ITEM_ON_LOAN"
+
+        # the action is not executed again, it would fail the second time
+        res, payload = _post(
+            client, json_headers, params, loan_pid, "checkout", "key-1"
+        )
+        assert res.status_code == 202
+        assert payload["status"] == "SUCCESS"
+
+        res, payload = _post(
+            client, json_headers, params, loan_pid, "extend", "key-1"
+        )
+        assert res.status_code == 422
+        assert payload["error_class"] == "IdempotencyKeyReusedError"
+
+        res, payload = _post(
+            client, json_headers, dict(params, end_date="2020-01-01"),
+            loan_pid, "checkout", "key-1",
+        )
+        assert res.status_code == 422
+        assert payload["error_class"] == "IdempotencyKeyReusedError"
+
+
+def test_rest_async_loan_action_failure(
+    app, json_headers, params, loan_created,
+    mock_ensure_item_is_available_for_checkout
+):
+    """Test that a failing asynchronous action is not retried."""
+    mock_ensure_item_is_available_for_checkout.side_effect = \
+        ItemNotAvailableError(item_pid=params["item_pid"])
+    with SwappedConfig("CIRCULATION_LOAN_ACTIONS_ASYNC", ["checkout"]), \
+            app.test_client() as client:
+        res, payload = _post(
+            client, json_headers, params, loan_created["pid"], "checkout",
+            "key-2",
+        )
+        assert res.status_code == 202
+        assert payload["status"] == "FAILURE"
+        assert payload["error"]["error_class"] == "ItemNotAvailableError"
+    assert Loan.get_record(loan_created.id)["state"] == "CREATED"
+
+    task_id = LoanActionTask.build_id("key-2")
+    trigger_loan_action.delay(task_id)
+    assert mock_ensure_item_is_available_for_checkout.call_count == 1
+    assert LoanActionTask.query.get(task_id).status == "FAILURE"
+
+
+def test_rest_async_loan_action_lost(app, json_headers, params, loan_created):
+    """Test that a pending task is enqueued again when requested again."""
+    loan_pid = loan_created["pid"]
+    with SwappedConfig("CIRCULATION_LOAN_ACTIONS_ASYNC", ["checkout"]), \
+            app.test_client() as client:
+        # the message of the task is lost
+        with mock.patch.object(trigger_loan_action, "delay") as mock_delay:
+            res, payload = _post(
+                client, json_headers, params, loan_pid, "checkout", "key-3"
+            )
+            mock_delay.assert_called_once_with(
+                LoanActionTask.build_id("key-3")
+            )
+        assert res.status_code == 202
+        assert payload["status"] == "PENDING"
+
+        res, payload = _post(
+            client, json_headers, params, loan_pid, "checkout", "key-3"
+        )
+        assert res.status_code == 202
+        assert payload["status"] == "SUCCESS"
+    assert Loan.get_record(loan_created.id)["state"] == "ITEM_ON_LOAN"
+
+
+def test_rest_async_loan_action_permission(
+    app, json_headers, params, loan_created
+):
+    """Test that the permission of the action is checked when requested."""
+    def deny(loan):
+        return mock.Mock(can=mock.Mock(return_value=False))
+
+    transitions = current_circulation.circulation.transitions_by_trigger[
+        ("CREATED", "checkout")
+    ]
+    with SwappedConfig("CIRCULATION_LOAN_ACTIONS_ASYNC", ["checkout"]), \
+            mock.patch.object(transitions[0], "permission_factory", deny), \
+            mock.patch.object(trigger_loan_action, "delay") as mock_delay, \
+            app.test_client() as client:
+        res, payload = _post(
+            client, json_headers, params, loan_created["pid"], "checkout",
+            "key-4",
+        )
+    assert res.status_code == 403
+    assert payload["error_class"] == "InvalidPermissionError"
+    assert not mock_delay.called
+    assert LoanActionTask.query.get(LoanActionTask.build_id("key-4")) is None
+
+
+def test_rest_loan_action_task_read_permission(
+    app, json_headers, params, loan_created
+):
+    """Test that a task is not found without the permission to read it."""
+    with SwappedConfig("CIRCULATION_LOAN_ACTIONS_ASYNC", ["checkout"]), \
+            app.test_client() as client:
+        res, payload = _post(
+            client, json_headers, params, loan_created["pid"], "checkout",
+            "key-6",
+        )
+        assert res.status_code == 202
+        url = payload["links"]["self"]
+
+        with SwappedNestedConfig(
+            ["CIRCULATION_REST_ENDPOINTS", "loanid",
+             "read_permission_factory_imp"],
+            deny_all,
+        ):
+            # an anonymous user is not the user who requested the action
+            res = client.get(url, headers=json_headers)
+            assert res.status_code == 404
+
+        res = client.get(url, headers=json_headers)
+        assert res.status_code == 200
+
+
+def test_loan_action_task_idempotency_key_per_user(app, db):
+    """Test that the idempotency keys are scoped to the user."""
+    task, created = LoanActionTask.get_or_create(
+        "key-5", "loan_pid", "checkout", {}, user_id=1
+    )
+    assert created
+    other_task, created = LoanActionTask.get_or_create(
+        "key-5", "loan_pid", "checkout", {}, user_id=2
+    )
+    assert created
+    assert other_task.id != task.id
+    assert LoanActionTask.get_or_create(
+        "key-5", "other_pid", "extend", {}, user_id=1
+    ) == (task, False)
+    assert not task.is_same_action("other_pid", "extend", {})
@@ -64,3 +64,28 @@ def test_signals_loan_extend(loan_created, params):
     assert updated_loan["state"] == "ITEM_ON_LOAN"
     assert initial_loan["end_date"] != updated_loan["end_date"]
     assert trigger == "extend"
+
+
+def test_signals_initial_loan_snapshot(loan_created, params):
+    """Test that the initial loan is not modified by the transition."""
+    recorded = []
+
+    def record_signals(_, initial_loan, loan, trigger):
+        recorded.append((initial_loan, loan, trigger))
+
+    loan_state_changed.connect(record_signals, weak=False)
+
+    current_circulation.circulation.trigger(
+        loan_created,
+        **dict(
+            params,
+            trigger="request",
+            pickup_location_pid="pickup_location_pid",
+        )
+    )
+    initial_loan, updated_loan, trigger = recorded.pop()
+    assert initial_loan is not updated_loan
+    assert initial_loan.model is updated_loan.model
+    assert "patron_pid" not in initial_loan
+    assert "pickup_location_pid" not in initial_loan
+    assert updated_loan["patron_pid"] == params["patron_pid"]
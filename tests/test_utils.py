@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 CERN.
+# Copyright (C) 2020 RERO.
+#
+# Invenio-Circulation is free software; you can redistribute it and/or modify
+# it under the terms of the MIT License; see LICENSE file for more details.
+
+"""Tests for circulation utils."""
+
+import arrow
+import pytest
+
+from invenio_circulation.utils import str2datetime
+
+
+@pytest.mark.parametrize("str_date", [
+    "2020-02-29",
+    "2020-02-29T10:11:12",
+    "2020-02-29T10:11:12.5",
+    "2020-02-29T10:11:12.123456",
+    "2020-02-29T10:11:12+00:00",
+    "2020-02-29T10:11:12.123456Z",
+    "2020-02-29T10:11:12+02:00",
+    "2020-02-29T10:11",
+])
+def test_str2datetime(str_date):
+    """Test that dates are parsed as the arrow parser does."""
+    value = str2datetime(str_date)
+    expected = arrow.get(str_date).to("utc")
+    assert value == expected
+    assert value.isoformat() == expected.isoformat()
+
+
+def test_str2datetime_invalid_date():
+    """Test that invalid dates are not parsed."""
+    with pytest.raises(ValueError):
+        str2datetime("2020-02-30")